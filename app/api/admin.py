@@ -3,33 +3,67 @@
 包含：用户管理、额度分配、用户列表查询
 """
 
-from typing import Optional
+import asyncio
+import time
+from typing import Annotated, Optional, Dict, Tuple
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload, joinedload
 from loguru import logger
 
-from app.core.database import get_db
+from app.core import quota_redis
+from app.core.database import get_db, is_unique_violation
+from app.core.responses import UTCORJSONResponse
 from app.core.auth import get_current_admin, User as UserModel
 from app.models.user_models import User, UserQuota, UserRole, get_password_hash
 from app.models.user_schemas import (
     UserCreateByAdmin, UserUpdate, UserQuotaUpdate,
     UserDetailResponse, UserListResponse, UsageRecordResponse,
-    UserQuotaResponse
+    UserQuotaResponse, build_user_detail_response, build_quota_response,
+    user_detail_list_adapter
 )
 from app.services.quota_service import QuotaService
 
 
 router = APIRouter(prefix="/api/admin", tags=["管理员"])
 
+# 用户列表总数缓存：筛选条件 -> (过期时间, 总数)
+USER_COUNT_CACHE_TTL = 30
+_user_count_cache: Dict[Tuple, Tuple[float, int]] = {}
+
+
+# 公共依赖
+AdminDep = Annotated[User, Depends(get_current_admin)]
+DbDep = Annotated[Session, Depends(get_db)]
+
+
+class Pagination:
+    """分页参数"""
+
+    def __init__(
+        self,
+        page: Annotated[int, Query(ge=1)] = 1,
+        page_size: Annotated[int, Query(ge=1, le=100)] = 20
+    ):
+        self.page = page
+        self.page_size = page_size
+
+    @property
+    def offset(self) -> int:
+        return (self.page - 1) * self.page_size
+
+
+PaginationDep = Annotated[Pagination, Depends()]
+
 
 # ============== 用户列表查询 ==============
 
 @router.get("/users", response_model=UserListResponse)
 async def get_users(
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db),
-    page: int = Query(1, ge=1),
-    page_size: int = Query(20, ge=1, le=100),
+    current_admin: AdminDep,
+    db: DbDep,
+    pagination: PaginationDep,
     role: Optional[UserRole] = None,
     is_active: Optional[bool] = None,
     search: Optional[str] = None
@@ -43,6 +77,9 @@ async def get_users(
     - **is_active**: 按状态筛选
     - **search**: 搜索邮箱或用户名
     """
+    # 先批量重置过期额度，避免逐个用户检查
+    QuotaService.bulk_reset_stale_quotas(db)
+
     query = db.query(User)
 
     # 筛选条件
@@ -55,35 +92,41 @@ async def get_users(
             (User.email.ilike(f"%{search}%")) | (User.username.ilike(f"%{search}%"))
         )
 
-    # 计算总数
-    total = query.count()
+    # 计算总数（首页实时计算，翻页时复用短期缓存）
+    cache_key = (role, is_active, search)
+    cached = _user_count_cache.get(cache_key)
+    if pagination.page > 1 and cached and cached[0] > time.monotonic():
+        total = cached[1]
+    else:
+        total = query.count()
+        if len(_user_count_cache) >= 256:
+            _user_count_cache.clear()
+        _user_count_cache[cache_key] = (time.monotonic() + USER_COUNT_CACHE_TTL, total)
 
     # 分页
-    offset = (page - 1) * page_size
-    users = query.offset(offset).limit(page_size).all()
+    users = (
+        query.options(selectinload(User.quota))
+        .offset(pagination.offset)
+        .limit(pagination.page_size)
+        .all()
+    )
 
     # 构建响应
     user_details = []
     for user in users:
-        quota = QuotaService.check_and_reset_daily_quota(db, user)
-        user_details.append(UserDetailResponse(
-            id=user.id,
-            email=user.email,
-            username=user.username,
-            role=user.role,
-            is_active=user.is_active,
-            is_verified=user.is_verified,
-            created_at=user.created_at,
-            last_login=user.last_login,
-            quota=quota
-        ))
-
-    return UserListResponse(
-        total=total,
-        page=page,
-        page_size=page_size,
-        users=user_details
-    )
+        quota = user.quota
+        if quota is None:
+            quota = QuotaService.check_and_reset_daily_quota(db, user)
+        user_details.append(build_user_detail_response(user, quota))
+
+    # 数据已是构建好的响应模型，直接整体转换后返回，跳过 FastAPI 对 response_model 的逐项校验
+    # 以 JSON 模式转换，datetime 输出为与其它接口一致的 ISO 字符串，不经 orjson 追加 Z
+    return UTCORJSONResponse({
+        "total": total,
+        "page": pagination.page,
+        "page_size": pagination.page_size,
+        "users": user_detail_list_adapter.dump_python(user_details, mode="json")
+    })
 
 
 # ============== 创建用户 ==============
@@ -91,8 +134,8 @@ async def get_users(
 @router.post("/users", response_model=UserDetailResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(
     user_data: UserCreateByAdmin,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: AdminDep,
+    db: DbDep
 ):
     """
     管理员创建新用户
@@ -103,9 +146,11 @@ async def create_user(
     - **role**: 角色（admin/member/user）
     - **daily_quota**: 每日额度（-1 表示无限）
     """
-    # 检查邮箱是否已存在
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
+    # 检查邮箱是否已存在（只查主键，不加载完整的 User 对象）
+    email_taken = db.execute(
+        select(User.id).where(User.email == user_data.email).limit(1)
+    ).first()
+    if email_taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="该邮箱已被注册"
@@ -115,13 +160,23 @@ async def create_user(
     new_user = User(
         email=user_data.email,
         username=user_data.username,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await asyncio.to_thread(get_password_hash, user_data.password),
         role=user_data.role,
         is_active=True,
         is_verified=True  # 管理员创建的用户自动验证
     )
     db.add(new_user)
-    db.flush()
+    try:
+        db.flush()
+    except IntegrityError as e:
+        db.rollback()
+        if not is_unique_violation(e, "email"):
+            raise
+        # 并发注册同一邮箱时由唯一约束兜底
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="该邮箱已被注册"
+        )
 
     # 创建额度记录
     user_quota = UserQuota(
@@ -130,25 +185,15 @@ async def create_user(
         daily_used=0
     )
     db.add(user_quota)
+    db.flush()
 
-    db.commit()
-    db.refresh(new_user)
-
-    quota = QuotaService.check_and_reset_daily_quota(db, new_user)
-
+    # 新建的额度无需重置；提交前构建响应，避免提交后属性过期再查一次
+    response = build_user_detail_response(new_user, user_quota)
     logger.info(f"Admin {current_admin.id} created user {new_user.id}")
 
-    return UserDetailResponse(
-        id=new_user.id,
-        email=new_user.email,
-        username=new_user.username,
-        role=new_user.role,
-        is_active=new_user.is_active,
-        is_verified=new_user.is_verified,
-        created_at=new_user.created_at,
-        last_login=new_user.last_login,
-        quota=quota
-    )
+    db.commit()
+
+    return response
 
 
 # ============== 更新用户信息 ==============
@@ -157,8 +202,8 @@ async def create_user(
 async def update_user(
     user_id: int,
     user_data: UserUpdate,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: AdminDep,
+    db: DbDep
 ):
     """
     更新用户信息（仅管理员）
@@ -193,17 +238,7 @@ async def update_user(
 
     logger.info(f"Admin {current_admin.id} updated user {user_id}")
 
-    return UserDetailResponse(
-        id=user.id,
-        email=user.email,
-        username=user.username,
-        role=user.role,
-        is_active=user.is_active,
-        is_verified=user.is_verified,
-        created_at=user.created_at,
-        last_login=user.last_login,
-        quota=quota
-    )
+    return build_user_detail_response(user, quota)
 
 
 # ============== 更新用户额度 ==============
@@ -212,8 +247,8 @@ async def update_user(
 async def update_user_quota(
     user_id: int,
     quota_data: UserQuotaUpdate,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: AdminDep,
+    db: DbDep
 ):
     """
     更新用户额度（仅管理员）
@@ -240,12 +275,14 @@ async def update_user_quota(
     else:
         quota.daily_quota = quota_data.daily_quota
 
-    db.commit()
-    db.refresh(quota)
-
+    db.flush()
+    response = build_quota_response(quota)
     logger.info(f"Admin {current_admin.id} updated quota for user {user_id}: {quota_data.daily_quota}")
 
-    return UserQuotaResponse.model_validate(quota)
+    db.commit()
+    await quota_redis.invalidate_limit(user_id)
+
+    return response
 
 
 # ============== 获取用户详情 ==============
@@ -253,13 +290,13 @@ async def update_user_quota(
 @router.get("/users/{user_id}", response_model=UserDetailResponse)
 async def get_user_detail(
     user_id: int,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: AdminDep,
+    db: DbDep
 ):
     """
     获取用户详细信息（仅管理员）
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.query(User).options(joinedload(User.quota)).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -268,17 +305,7 @@ async def get_user_detail(
 
     quota = QuotaService.check_and_reset_daily_quota(db, user)
 
-    return UserDetailResponse(
-        id=user.id,
-        email=user.email,
-        username=user.username,
-        role=user.role,
-        is_active=user.is_active,
-        is_verified=user.is_verified,
-        created_at=user.created_at,
-        last_login=user.last_login,
-        quota=quota
-    )
+    return build_user_detail_response(user, quota)
 
 
 # ============== 删除用户 ==============
@@ -286,8 +313,8 @@ async def get_user_detail(
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
     user_id: int,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: AdminDep,
+    db: DbDep
 ):
     """
     删除用户（仅管理员）
@@ -320,9 +347,9 @@ async def delete_user(
 @router.get("/users/{user_id}/usage", response_model=list[UsageRecordResponse])
 async def get_user_usage_records(
     user_id: int,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db),
-    limit: int = Query(50, ge=1, le=200)
+    current_admin: AdminDep,
+    db: DbDep,
+    limit: Annotated[int, Query(ge=1, le=200)] = 50
 ):
     """
     获取用户的使用记录（仅管理员）
@@ -3,24 +3,71 @@
 包含：注册、登录、获取用户信息
 """
 
+import asyncio
+import time
+from collections import deque
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Deque, Dict
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from loguru import logger
 
-from app.core.database import get_db
+from app.core import quota_redis
+from app.core.database import get_db, is_unique_violation
 from app.core.auth import get_current_user, create_access_token, get_current_admin
-from app.models.user_models import User, UserQuota, UserRole, verify_password, get_password_hash
+from app.core.quota_middleware import get_cached_quota
+from app.models.user_models import (
+    User, UserQuota, UserRole, get_password_hash, verify_and_update_password
+)
 from app.models.user_schemas import (
     UserCreate, UserLogin, UserResponse, Token,
-    UserDetailResponse, UserQuotaResponse, OnboardingRequest
+    UserDetailResponse, OnboardingRequest,
+    build_user_response, build_user_detail_response
 )
 from app.services.quota_service import QuotaService
 
 
 router = APIRouter(prefix="/api/auth", tags=["认证"])
 
+# 登录限流：同一邮箱 + IP 每分钟最多 5 次尝试
+LOGIN_RATE_LIMIT = 5
+LOGIN_RATE_WINDOW = 60
+_login_attempts: Dict[str, Deque[float]] = {}
+_login_last_sweep = 0.0
+
+
+def _sweep_login_attempts(now: float):
+    """每个窗口清理一次已过期的 key，避免大量随机邮箱使字典无限增长"""
+    global _login_last_sweep
+    if now - _login_last_sweep < LOGIN_RATE_WINDOW:
+        return
+    _login_last_sweep = now
+    expired = [key for key, attempts in _login_attempts.items() if now - attempts[-1] > LOGIN_RATE_WINDOW]
+    for key in expired:
+        del _login_attempts[key]
+
+
+def _check_login_rate_limit(key: str):
+    """滑动窗口限流，超出限制时抛出 429"""
+    now = time.monotonic()
+    _sweep_login_attempts(now)
+
+    attempts = _login_attempts.get(key)
+    if attempts is None:
+        attempts = _login_attempts[key] = deque()
+    while attempts and now - attempts[0] > LOGIN_RATE_WINDOW:
+        attempts.popleft()
+
+    if len(attempts) >= LOGIN_RATE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="登录尝试过于频繁，请稍后再试"
+        )
+    attempts.append(now)
+
 
 # ============== 用户初始化 (Onboarding) ==============
 
@@ -40,7 +87,7 @@ async def onboarding(
     db.commit()
     db.refresh(current_user)
     
-    return UserResponse.model_validate(current_user)
+    return build_user_response(current_user)
 
 
 # ============== 用户注册 ==============
@@ -54,9 +101,11 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     - **username**: 用户名
     - **password**: 密码（至少6位）
     """
-    # 检查邮箱是否已存在
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
+    # 检查邮箱是否已存在（只查主键，不加载完整的 User 对象）
+    email_taken = db.execute(
+        select(User.id).where(User.email == user_data.email).limit(1)
+    ).first()
+    if email_taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="该邮箱已被注册"
@@ -66,13 +115,23 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     new_user = User(
         email=user_data.email,
         username=user_data.username,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await asyncio.to_thread(get_password_hash, user_data.password),
         role=UserRole.USER,  # 默认为普通用户
         is_active=True,
         is_verified=False
     )
     db.add(new_user)
-    db.flush()  # 获取用户 ID
+    try:
+        db.flush()  # 获取用户 ID
+    except IntegrityError as e:
+        db.rollback()
+        if not is_unique_violation(e, "email"):
+            raise
+        # 并发注册同一邮箱时由唯一约束兜底
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="该邮箱已被注册"
+        )
 
     # 创建用户额度记录（普通用户默认 50 条/天）
     user_quota = UserQuota(
@@ -82,35 +141,44 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     db.add(user_quota)
 
-    db.commit()
-    db.refresh(new_user)
-
-    logger.info(f"New user registered: {new_user.email}")
-
-    # 生成 token
+    # flush 后字段已全部就绪，在提交前构建响应，避免提交后属性过期再查一次
     access_token = create_access_token(data={"sub": str(new_user.id), "role": new_user.role})
-
-    return Token(
+    token = Token(
         access_token=access_token,
-        user=UserResponse.model_validate(new_user)
+        user=build_user_response(new_user)
     )
 
+    db.commit()
+
+    logger.info(f"New user registered: {user_data.email}")
+
+    return token
+
 
 # ============== 用户登录 ==============
 
 @router.post("/login", response_model=Token)
-async def login(credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: UserLogin, request: Request, db: Session = Depends(get_db)):
     """
     用户登录
 
     - **email**: 邮箱地址
     - **password**: 密码
     """
+    client_host = request.client.host if request.client else ""
+    _check_login_rate_limit(f"{credentials.email}:{client_host}")
+
     # 查找用户
     user = db.query(User).filter(User.email == credentials.email).first()
 
-    # 验证用户和密码
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    # 验证用户和密码（哈希计算放到线程池，避免阻塞事件循环）
+    # 旧算法（bcrypt）的哈希在同一次调用中一并生成 argon2id 新哈希
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await asyncio.to_thread(
+            verify_and_update_password, credentials.password, user.hashed_password
+        )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="邮箱或密码错误"
@@ -123,48 +191,44 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
             detail="账户已被禁用"
         )
 
+    # 登录成功后保存升级后的哈希
+    if new_hash:
+        user.hashed_password = new_hash
+
     # 更新最后登录时间
     user.last_login = datetime.utcnow()
-    db.commit()
-
-    logger.info(f"User logged in: {user.email}")
 
-    # 生成 token
+    # 生成 token（提交前构建响应，避免提交后属性过期再查一次）
     access_token = create_access_token(data={"sub": str(user.id), "role": user.role})
-
-    return Token(
+    token = Token(
         access_token=access_token,
-        user=UserResponse.model_validate(user)
+        user=build_user_response(user)
     )
 
+    db.commit()
+
+    # 使用 Redis 计数额度时预先加载当日额度，首次请求无需再查数据库
+    if quota_redis.enabled and user.role == UserRole.USER:
+        quota = QuotaService.check_and_reset_daily_quota(db, user)
+        await quota_redis.prime_quota(user.id, quota.daily_quota, quota.daily_used)
+
+    logger.info(f"User logged in: {credentials.email}")
+
+    return token
+
 
 # ============== 获取当前用户信息 ==============
 
 @router.get("/me", response_model=UserDetailResponse)
 async def get_current_user_info(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    quota: UserQuota = Depends(get_cached_quota)
 ):
     """
     获取当前登录用户的详细信息（包含额度）
     需要在请求头中携带 Authorization: Bearer <token>
     """
-    quota = QuotaService.check_and_reset_daily_quota(db, current_user)
-
-    return UserDetailResponse(
-        id=current_user.id,
-        email=current_user.email,
-        username=current_user.username,
-        role=current_user.role,
-        is_active=current_user.is_active,
-        is_verified=current_user.is_verified,
-        is_onboarded=current_user.is_onboarded,  # 添加字段
-        personality=current_user.personality,
-        emotional_profile=current_user.emotional_profile,
-        created_at=current_user.created_at,
-        last_login=current_user.last_login,
-        quota=UserQuotaResponse.model_validate(quota)
-    )
+    return build_user_detail_response(current_user, quota)
 
 
 # ============== 获取用户额度信息 ==============
@@ -172,10 +236,11 @@ async def get_current_user_info(
 @router.get("/quota", response_model=dict)
 async def get_quota_info(
     current_user: User = Depends(get_current_user),
+    quota: UserQuota = Depends(get_cached_quota),
     db: Session = Depends(get_db)
 ):
     """
     获取当前用户的额度信息
     """
-    quota_info = QuotaService.get_user_quota_info(db, current_user)
+    quota_info = QuotaService.get_user_quota_info(db, current_user, quota)
     return quota_info
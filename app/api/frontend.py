@@ -3,25 +3,38 @@ Frontend API Routes
 API endpoints for the web frontend
 """
 
-from typing import Optional, List, Dict
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from typing import Optional, List, Dict, Tuple
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import Row, desc, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from loguru import logger
-import json
+import base64
+import hashlib
 import os
+import asyncio
+import tempfile
+import threading
+import time
+from pathlib import Path
 from datetime import datetime
 
+import aiofiles
+import aiofiles.os
+import orjson
+
 from ..core.agent import SelfAgent
 from ..models.data_models import UserInput
 from ..models.user_models import ChatMessage as DBChatMessage
-from ..core.database import get_db
+from ..core.database import get_async_db, AsyncSessionLocal
 from ..core.quota_middleware import check_chat_quota, check_multimodal_quota
 from ..core.auth import get_current_user, User
-from ..core.memory_manager import MemoryManager
+from ..core.memory_manager import get_memory_manager
+from ..core.responses import UTCORJSONResponse
 from ..services.profile.emotion_profile import EmotionProfileManager
+from ..services.semantic_cache import SemanticCache
+from ..services.conversation_buffer import ConversationBuffer
 
 
 router = APIRouter(prefix="/api/frontend", tags=["frontend"])
@@ -53,21 +66,138 @@ class HistoryPayload(BaseModel):
 
 # Initialize agent (singleton)
 _agent_instance = None
-_memory_manager = MemoryManager(persist_path="./data/chroma_db")
+_agent_init_lock = threading.Lock()  # 正常在启动时初始化，这里防止并发的首次请求重复创建
+_memory_manager = get_memory_manager("./data/chroma_db")
 _profile_manager = EmotionProfileManager(config={})  # Initialize profile manager
-_conversation_buffers: Dict[str, List[Dict]] = {}
+_semantic_cache = SemanticCache(threshold=0.85)  # Reuse replies for near-duplicate messages
+_conversation_buffer = ConversationBuffer()  # 设置 REDIS_URL 时多 worker 共享
+
+# 上传文件临时目录（模块加载时创建一次）
+TEMP_DIR = "temp"
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB
+os.makedirs(TEMP_DIR, exist_ok=True)
+
+
+# ==================== Static Payloads ====================
+# 静态数据在模块加载时序列化一次，请求时直接返回字节
+
+HEALTH_VERSION = "1.0.0"
+STATIC_CACHE_HEADERS = {"Cache-Control": "public, max-age=3600"}
+
+CRISIS_RESOURCES = {
+    "hotlines": [
+        {
+            "name": "全国心理援助热线",
+            "phone": "400-161-9995",
+            "available": "24小时"
+        },
+        {
+            "name": "北京危机干预热线",
+            "phone": "010-82951332",
+            "available": "24小时"
+        },
+        {
+            "name": "希望24热线",
+            "phone": "400-161-9995",
+            "available": "24小时"
+        },
+        {
+            "name": "上海心理热线",
+            "phone": "021-12320-5",
+            "available": "24小时"
+        },
+        {
+            "name": "广州心理热线",
+            "phone": "020-81899120",
+            "available": "24小时"
+        }
+    ],
+    "reminders": [
+        "您不是一个人",
+        "这种感觉会过去",
+        "请给自己一个机会",
+        "专业帮助可以带来改变"
+    ]
+}
+
+DBT_SKILLS_OVERVIEW = {
+    "modules": [
+        {
+            "name": "痛苦耐受",
+            "name_en": "Distress Tolerance",
+            "skills": ["TIPP", "STOP", "ACCEPTS", "自我安抚"]
+        },
+        {
+            "name": "情绪调节",
+            "name_en": "Emotion Regulation",
+            "skills": ["PLEASE", "反向行动", "检验事实"]
+        },
+        {
+            "name": "人际效能",
+            "name_en": "Interpersonal Effectiveness",
+            "skills": ["DEAR MAN", "GIVE", "FAST"]
+        },
+        {
+            "name": "正念",
+            "name_en": "Mindfulness",
+            "skills": ["观察", "投入", "非评判"]
+        }
+    ]
+}
+
+_CRISIS_RESOURCES_JSON = orjson.dumps(CRISIS_RESOURCES)
+_DBT_SKILLS_JSON = orjson.dumps(DBT_SKILLS_OVERVIEW)
+
+
+def _content_etag(body: bytes) -> str:
+    """按内容生成 ETag，内容变化（重新部署）时自动失效"""
+    return f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+
+
+_CRISIS_RESOURCES_ETAG = _content_etag(_CRISIS_RESOURCES_JSON)
+_DBT_SKILLS_ETAG = _content_etag(_DBT_SKILLS_JSON)
+
+
+def _static_json_response(request: Request, body: bytes, etag: str) -> Response:
+    """返回预序列化的静态 JSON；客户端缓存仍有效时返回 304"""
+    headers = {**STATIC_CACHE_HEADERS, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 def get_agent():
     """Get or create agent instance"""
     global _agent_instance
     if _agent_instance is None:
-        model_name = os.getenv("MODEL_NAME", "deepseek-chat")
-        _agent_instance = SelfAgent(model_type=model_name)
-        logger.info("Frontend API: Agent initialized")
+        with _agent_init_lock:
+            if _agent_instance is None:
+                model_name = os.getenv("MODEL_NAME", "deepseek-chat")
+                _agent_instance = SelfAgent(model_type=model_name)
+                logger.info("Frontend API: Agent initialized")
     return _agent_instance
 
 
+async def _save_upload(upload: UploadFile, prefix: str) -> str:
+    """
+    将上传文件分块异步写入临时目录
+
+    文件名由 tempfile 生成，只保留原始扩展名，避免路径注入。
+
+    Returns:
+        临时文件路径
+    """
+    suffix = Path(upload.filename or "").suffix
+    fd, file_path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=TEMP_DIR)
+    os.close(fd)
+
+    async with aiofiles.open(file_path, "wb") as f:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            await f.write(chunk)
+
+    return file_path
+
+
 class HistoryMessage(BaseModel):
     id: int
     role: str
@@ -78,23 +208,51 @@ class HistoryMessage(BaseModel):
         from_attributes = True
 
 
+def _encode_history_cursor(message: Row) -> str:
+    """将 (created_at, id) 编码为翻页游标"""
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析翻页游标，格式错误时返回 400"""
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="无效的翻页游标")
+
+
 @router.get("/history", response_model=List[HistoryMessage])
 async def get_history(
-    limit: int = 50,
-    offset: int = 0,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get chat history for current user
+
+    按 (created_at, id) 倒序做游标分页：下一页游标通过响应头 X-Next-Cursor 返回，
+    作为 cursor 参数传入即可获取更早的消息。
     """
-    messages = db.query(DBChatMessage)\
-        .filter(DBChatMessage.user_id == current_user.id)\
-        .order_by(desc(DBChatMessage.created_at))\
-        .limit(limit)\
-        .offset(offset)\
-        .all()
-    
+    # 只查询响应需要的列，不加载完整 ORM 实体
+    stmt = select(
+        DBChatMessage.id, DBChatMessage.role, DBChatMessage.content, DBChatMessage.created_at
+    )\
+        .where(DBChatMessage.user_id == current_user.id)\
+        .order_by(desc(DBChatMessage.created_at), desc(DBChatMessage.id))\
+        .limit(limit)
+    if cursor:
+        stmt = stmt.where(
+            tuple_(DBChatMessage.created_at, DBChatMessage.id) < _decode_history_cursor(cursor)
+        )
+    messages = (await db.execute(stmt)).all()
+
+    if len(messages) == limit:
+        response.headers["X-Next-Cursor"] = _encode_history_cursor(messages[-1])
+
     # Reverse to show oldest first in frontend (or keep desc and let frontend handle)
     # Usually chat history API returns latest N messages. 
     # Frontend usually prepends them.
@@ -107,7 +265,7 @@ async def get_history(
 async def chat(
     message: ChatMessage,
     current_user: User = Depends(check_chat_quota),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> ChatResponse:
     """
     Process chat message from frontend
@@ -117,7 +275,7 @@ async def chat(
     - **timestamp**: Optional timestamp (defaults to now)
     """
     try:
-        logger.info(f"Chat request from user={current_user.id}: {message.text[:50]}...")
+        logger.opt(lazy=True).info("Chat request from user={}: {}...", lambda: current_user.id, lambda: message.text[:50])
 
         # Save User Message to DB
         user_msg = DBChatMessage(
@@ -126,7 +284,7 @@ async def chat(
             content=message.text
         )
         db.add(user_msg)
-        db.commit()
+        await db.commit()
 
         agent = get_agent()
 
@@ -136,8 +294,16 @@ async def chat(
             text=message.text
         )
 
-        # Process interaction
-        response_text = agent.process_interaction(user_input)
+        # Process interaction (near-duplicate messages reuse the cached reply;
+        # crisis-related messages get no vector and always reach the agent)
+        buf_key = str(current_user.id)
+        query_vector = await asyncio.to_thread(_semantic_cache.embed, message.text)
+        response_text = _semantic_cache.lookup(buf_key, query_vector)
+        if response_text is None:
+            response_text = await agent.aprocess_interaction(user_input)
+            # 只缓存经风险评估为低风险的回复，干预/危机路径的回复不复用
+            if user_input.metadata.get("risk_low") and not response_text.startswith("System Error:"):
+                _semantic_cache.add(buf_key, query_vector, response_text)
 
         # Save Assistant Message to DB
         ai_msg = DBChatMessage(
@@ -146,16 +312,16 @@ async def chat(
             content=response_text
         )
         db.add(ai_msg)
-        db.commit()
+        await db.commit()
 
-        buf_key = str(current_user.id)
-        buf = _conversation_buffers.get(buf_key, [])
-        buf.append({"role": "user", "content": message.text, "ts": datetime.now().isoformat()})
-        buf.append({"role": "assistant", "content": response_text, "ts": datetime.now().isoformat()})
-        _conversation_buffers[buf_key] = buf
-        if len(buf) >= 12:
-            summary = await _memory_manager.compress_and_archive(buf_key, buf, agent_instance=agent)
-            _conversation_buffers[buf_key] = buf[-2:]
+        now = time.time_ns()
+        await _conversation_buffer.append(
+            buf_key,
+            {"role": "user", "content": message.text, "ts": now},
+            {"role": "assistant", "content": response_text, "ts": now}
+        )
+        # 压缩归档在后台进行，不阻塞本次响应
+        _conversation_buffer.schedule_compress(buf_key, _memory_manager, agent)
 
         # TODO: Extract emotion and risk level from agent context
         # For now, returning basic response
@@ -172,6 +338,92 @@ async def chat(
         raise HTTPException(status_code=500, detail=f"处理聊天消息时出错: {str(e)}")
 
 
+def _sse_event(payload: Dict) -> bytes:
+    """编码一条 SSE 事件"""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    message: ChatMessage,
+    current_user: User = Depends(check_chat_quota),
+    db: AsyncSession = Depends(get_async_db)
+) -> StreamingResponse:
+    """
+    Process chat message and stream the reply as Server-Sent Events
+    需要认证，消耗 1 额度
+
+    每个事件为 `data: {"token": "..."}`，结束时发送 `data: {"done": true}`；
+    出错时发送 `data: {"error": "..."}`。
+    """
+    logger.opt(lazy=True).info("Chat stream request from user={}: {}...", lambda: current_user.id, lambda: message.text[:50])
+
+    # Save User Message to DB
+    db.add(DBChatMessage(
+        user_id=current_user.id,
+        role="user",
+        content=message.text
+    ))
+    await db.commit()
+
+    agent = get_agent()
+    user_id = current_user.id
+    buf_key = str(user_id)
+    user_input = UserInput(
+        user_id=buf_key,
+        text=message.text
+    )
+
+    query_vector = await asyncio.to_thread(_semantic_cache.embed, message.text)
+    cached_text = _semantic_cache.lookup(buf_key, query_vector)
+
+    async def event_stream():
+        parts: List[str] = []
+        try:
+            if cached_text is not None:
+                parts.append(cached_text)
+                yield _sse_event({"token": cached_text})
+            else:
+                async for token in agent.astream_interaction(user_input):
+                    parts.append(token)
+                    yield _sse_event({"token": token})
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield _sse_event({"error": f"处理聊天消息时出错: {str(e)}"})
+            return
+
+        response_text = "".join(parts)
+        # 只缓存经风险评估为低风险的回复，干预/危机路径的回复不复用
+        if cached_text is None and response_text and user_input.metadata.get("risk_low"):
+            _semantic_cache.add(buf_key, query_vector, response_text)
+
+        # 请求级 Session 在流开始前已关闭，这里单独开一个
+        async with AsyncSessionLocal() as stream_db:
+            stream_db.add(DBChatMessage(
+                user_id=user_id,
+                role="assistant",
+                content=response_text
+            ))
+            await stream_db.commit()
+
+        now = time.time_ns()
+        await _conversation_buffer.append(
+            buf_key,
+            {"role": "user", "content": message.text, "ts": now},
+            {"role": "assistant", "content": response_text, "ts": now}
+        )
+        # 压缩归档在后台进行，不阻塞本次响应
+        _conversation_buffer.schedule_compress(buf_key, _memory_manager, agent)
+
+        yield _sse_event({"done": True})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/chat/multimodal")
 async def chat_multimodal(
     text: str = Form(default=""),
@@ -187,26 +439,24 @@ async def chat_multimodal(
     - **file**: Audio or image file
     - **file_type**: Type of file ('audio' or 'image')
     """
+    file_path = None
     try:
-        logger.info(f"Multimodal chat from user={current_user.id}, type={file_type}, file={file.filename}")
+        logger.info("Multimodal chat from user={}, type={}, file={}", current_user.id, file_type, file.filename)
 
         agent = get_agent()
 
-        # Save file temporarily
-        temp_dir = "temp"
-        os.makedirs(temp_dir, exist_ok=True)
-
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_path = f"{temp_dir}/{current_user.id}_{timestamp}_{file.filename}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-
-        # Create user input with file path
         user_input = UserInput(
             user_id=str(current_user.id),
             text=text or f"发送了一个{file_type}文件"
         )
+
+        # Save file temporarily (chunked, non-blocking)；Agent 拿到的是文件路径，不复制文件内容
+        file_path = await _save_upload(file, prefix=f"{current_user.id}_")
+        media = Path(file_path)
+        if file_type == "audio":
+            user_input.audio_data = media
+        else:
+            user_input.image_data = media
         # Add file info to metadata
         user_input.metadata = {
             "file_path": file_path,
@@ -215,22 +465,17 @@ async def chat_multimodal(
         }
 
         # Process interaction
-        response_text = agent.process_interaction(user_input)
+        response_text = await agent.aprocess_interaction(user_input)
 
         buf_key = str(current_user.id)
-        buf = _conversation_buffers.get(buf_key, [])
-        buf.append({"role": "user", "content": user_input.text, "ts": datetime.now().isoformat()})
-        buf.append({"role": "assistant", "content": response_text, "ts": datetime.now().isoformat()})
-        _conversation_buffers[buf_key] = buf
-        if len(buf) >= 12:
-            summary = await _memory_manager.compress_and_archive(buf_key, buf, agent_instance=agent)
-            _conversation_buffers[buf_key] = buf[-2:]
-
-        # Clean up temp file
-        try:
-            os.remove(file_path)
-        except:
-            pass
+        now = time.time_ns()
+        await _conversation_buffer.append(
+            buf_key,
+            {"role": "user", "content": user_input.text, "ts": now},
+            {"role": "assistant", "content": response_text, "ts": now}
+        )
+        # 压缩归档在后台进行，不阻塞本次响应
+        _conversation_buffer.schedule_compress(buf_key, _memory_manager, agent)
 
         return ChatResponse(
             response=response_text,
@@ -244,6 +489,14 @@ async def chat_multimodal(
         logger.error(f"Multimodal chat error: {e}")
         raise HTTPException(status_code=500, detail=f"处理多媒体消息时出错: {str(e)}")
 
+    finally:
+        # Clean up temp file
+        if file_path:
+            try:
+                await aiofiles.os.remove(file_path)
+            except OSError:
+                pass
+
 
 # ==================== Emotion Report API ====================
 
@@ -261,10 +514,10 @@ async def get_emotion_report(
         if current_user.role.value != "admin" and str(current_user.id) != user_id:
             raise HTTPException(status_code=403, detail="无权访问其他用户的报告")
 
-        logger.info(f"Emotion report request for user={user_id}")
+        logger.info("Emotion report request for user={}", user_id)
 
-        # 加载用户画像
-        profile = _profile_manager.load_profile(user_id)
+        # 加载用户画像（同步读文件，放到线程中执行）
+        profile = await asyncio.to_thread(_profile_manager.load_profile, user_id)
         
         # 如果没有画像或快照，返回空数据
         if not profile or not profile.snapshots:
@@ -276,24 +529,22 @@ async def get_emotion_report(
                 recommendations=[]
             )
 
-        # 获取最新情绪
-        latest = profile.snapshots[-1]
-        # 找出得分最高的情绪
-        current_emotion = max(latest.emotions.items(), key=lambda x: x[1])[0] if latest.emotions else "未知"
+        # 最近 5 次快照各自得分最高的情绪，最后一项即当前情绪
+        recent = profile.snapshots[-5:]
+        top_emotions = [max(s.emotions, key=s.emotions.get) if s.emotions else "未知" for s in recent]
+        latest = recent[-1]
+        current_emotion = top_emotions[-1]
         
-        # 构建最近趋势（取最后 5 次）
-        recent_trends = []
-        for s in profile.snapshots[-5:]:
-            top_emotion = max(s.emotions.items(), key=lambda x: x[1])[0] if s.emotions else "未知"
-            # 将 timestamp 转换为 readable format
-            dt = datetime.fromtimestamp(s.timestamp)
-            date_str = dt.strftime("%Y-%m-%d %H:%M")
-            
-            recent_trends.append({
-                "date": date_str,
+        # 构建最近趋势
+        trend_score = int(latest.arousal * 100)  # 使用唤醒度作为分数示例
+        recent_trends = [
+            {
+                "date": datetime.fromtimestamp(s.timestamp).strftime("%Y-%m-%d %H:%M"),
                 "emotion": top_emotion,
-                "score": int(latest.arousal * 100)  # 使用唤醒度作为分数示例
-            })
+                "score": trend_score
+            }
+            for s, top_emotion in zip(recent, top_emotions)
+        ]
             
         # 生成简单建议
         recommendations = ["继续保持觉察"]
@@ -323,89 +574,40 @@ async def get_emotion_report(
 # ==================== Crisis Resources API ====================
 
 @router.get("/crisis-resources")
-async def get_crisis_resources():
+async def get_crisis_resources(request: Request):
     """Get crisis intervention resources"""
-    return {
-        "hotlines": [
-            {
-                "name": "全国心理援助热线",
-                "phone": "400-161-9995",
-                "available": "24小时"
-            },
-            {
-                "name": "北京危机干预热线",
-                "phone": "010-82951332",
-                "available": "24小时"
-            },
-            {
-                "name": "希望24热线",
-                "phone": "400-161-9995",
-                "available": "24小时"
-            },
-            {
-                "name": "上海心理热线",
-                "phone": "021-12320-5",
-                "available": "24小时"
-            },
-            {
-                "name": "广州心理热线",
-                "phone": "020-81899120",
-                "available": "24小时"
-            }
-        ],
-        "reminders": [
-            "您不是一个人",
-            "这种感觉会过去",
-            "请给自己一个机会",
-            "专业帮助可以带来改变"
-        ]
-    }
+    return _static_json_response(request, _CRISIS_RESOURCES_JSON, _CRISIS_RESOURCES_ETAG)
 
 
 # ==================== DBT Skills API (Frontend Wrapper) ====================
 
 @router.get("/skills")
-async def get_dbt_skills():
+async def get_dbt_skills(request: Request):
     """Get all DBT skills for frontend display"""
     # This would call the DBT module API
     # For now, return mock data
-    return {
-        "modules": [
-            {
-                "name": "痛苦耐受",
-                "name_en": "Distress Tolerance",
-                "skills": ["TIPP", "STOP", "ACCEPTS", "自我安抚"]
-            },
-            {
-                "name": "情绪调节",
-                "name_en": "Emotion Regulation",
-                "skills": ["PLEASE", "反向行动", "检验事实"]
-            },
-            {
-                "name": "人际效能",
-                "name_en": "Interpersonal Effectiveness",
-                "skills": ["DEAR MAN", "GIVE", "FAST"]
-            },
-            {
-                "name": "正念",
-                "name_en": "Mindfulness",
-                "skills": ["观察", "投入", "非评判"]
-            }
-        ]
-    }
+    return _static_json_response(request, _DBT_SKILLS_JSON, _DBT_SKILLS_ETAG)
 
 
 # ==================== Health Check ====================
 
 @router.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """Frontend API health check"""
-    return {
-        "status": "ok",
-        "service": "selfagent-frontend-api",
-        "version": "1.0.0",
-        "agent_initialized": _agent_instance is not None
-    }
+    agent_initialized = _agent_instance is not None
+    etag = f'W/"{HEALTH_VERSION}-{int(agent_initialized)}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return UTCORJSONResponse(
+        content={
+            "status": "ok",
+            "service": "selfagent-frontend-api",
+            "version": HEALTH_VERSION,
+            "agent_initialized": agent_initialized
+        },
+        headers={"ETag": etag}
+    )
 
 @router.post("/memory/compress")
 async def compress_memory(
@@ -1,16 +1,25 @@
 """
 用户画像管理 API
-读取 profiles/ 目录中的用户画像 JSON 文件
+从 profiles 表查询用户画像（画像管理器保存 profiles/ 目录 JSON 文件时同步写入）
 """
 
+import asyncio
+import base64
 import os
-import json
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Depends
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+import orjson
 from pydantic import BaseModel
 from loguru import logger
+from sqlalchemy import desc, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import get_current_admin
+from app.core.database import get_async_db
+from app.core.responses import UTCORJSONResponse
+from app.models.user_models import ProfileRecord
+from app.services.profile.profile_store import import_profile_files
 
 
 router = APIRouter(prefix="/api/v1/admin", tags=["用户画像管理"])
@@ -42,11 +51,12 @@ class ProfileDetail(BaseModel):
     intervention_count: int = 0
     avg_recovery_time: float = 0.0
     data_quality_score: float = 0.0
-    emotion_baseline: dict = {}
-    emotion_trend: dict = {}
-    personality: dict = {}
-    risk_prediction: dict = {}
-    snapshots: List[dict] = []
+    # 嵌套结构原样来自画像文件，声明为 Any 避免逐层校验
+    emotion_baseline: Any = {}
+    emotion_trend: Any = {}
+    personality: Any = {}
+    risk_prediction: Any = {}
+    snapshots: Any = []
 
 
 class DashboardStats(BaseModel):
@@ -60,132 +70,169 @@ class DashboardStats(BaseModel):
 
 # ==================== Helper Functions ====================
 
+@lru_cache(maxsize=4096)
+def _read_profile_cached(filepath: str, mtime_ns: int) -> Optional[dict]:
+    """
+    按 (路径, 修改时间) 缓存解析结果
+
+    文件被重写后 mtime 变化即产生新的缓存键，旧条目由 LRU 自然淘汰。
+    """
+    with open(filepath, 'rb') as f:
+        return orjson.loads(f.read())
+
+
 def read_profile_file(filename: str) -> Optional[dict]:
-    """读取单个画像文件"""
+    """
+    读取单个画像文件（数据库中尚无记录时的回退）
+
+    返回的 dict 在缓存中共享，调用方不应修改。
+    """
     filepath = os.path.join(PROFILES_DIR, filename)
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return _read_profile_cached(filepath, os.stat(filepath).st_mtime_ns)
     except Exception as e:
         logger.warning(f"Failed to read profile {filename}: {e}")
         return None
 
 
-def get_all_profile_files() -> List[str]:
-    """获取所有画像文件名"""
-    if not os.path.exists(PROFILES_DIR):
-        logger.warning(f"Profiles directory not found: {PROFILES_DIR}")
-        return []
+def _encode_profile_cursor(updated_at: Optional[str], user_id: str) -> str:
+    """将 (updated_at, user_id) 编码为翻页游标"""
+    return base64.urlsafe_b64encode(orjson.dumps([updated_at or "", user_id])).decode()
+
+
+def _decode_profile_cursor(cursor: str) -> Tuple[str, str]:
+    """解析翻页游标，格式错误时返回 400"""
+    try:
+        updated_at, user_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(updated_at), str(user_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的翻页游标")
+
+
+async def _query_dashboard_stats(db: AsyncSession) -> DashboardStats:
+    """在数据库中聚合仪表板统计"""
+    row = (await db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(ProfileRecord.total_interactions), 0),
+            func.coalesce(func.sum(ProfileRecord.crisis_count), 0),
+            func.coalesce(func.sum(ProfileRecord.intervention_count), 0),
+            func.coalesce(func.avg(ProfileRecord.data_quality_score), 0.0),
+        )
+    )).one()
 
-    files = []
-    for f in os.listdir(PROFILES_DIR):
-        # Skip hidden files and non-json files
-        if f.startswith('.') or f.startswith('._') or not f.endswith('.json'):
-            continue
-        # Skip None.json (invalid user)
-        if f == 'None.json':
-            continue
-        files.append(f)
-    return files
+    return DashboardStats(
+        total_profiles=row[0],
+        total_interactions=row[1],
+        total_crisis=row[2],
+        total_interventions=row[3],
+        avg_data_quality=row[4]
+    )
 
 
 # ==================== API Endpoints ====================
 
 @router.get("/profiles", response_model=List[ProfileSummary])
 async def list_profiles(
-    _: bool = Depends(get_current_admin)
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    search: Optional[str] = Query(None, max_length=100),
+    _: bool = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
 ) -> List[ProfileSummary]:
     """
-    获取所有用户画像列表
+    获取用户画像列表
 
-    返回画像摘要信息，包括用户ID、互动次数、危机次数等
-    """
-    profiles = []
-
-    for filename in get_all_profile_files():
-        data = read_profile_file(filename)
-        if not data:
-            continue
-
-        profiles.append(ProfileSummary(
-            user_id=data.get('user_id', filename.replace('.json', '')),
-            created_at=data.get('created_at'),
-            updated_at=data.get('updated_at'),
-            total_interactions=data.get('total_interactions', 0),
-            crisis_count=data.get('crisis_count', 0),
-            intervention_count=data.get('intervention_count', 0),
-            data_quality_score=data.get('data_quality_score', 0.0)
-        ))
+    返回画像摘要信息，包括用户ID、互动次数、危机次数等。
+    按 (updated_at, user_id) 倒序做游标分页：下一页游标通过响应头 X-Next-Cursor 返回。
 
-    # Sort by updated_at descending
-    profiles.sort(key=lambda p: p.updated_at or '', reverse=True)
-
-    return profiles
+    - **limit**: 每页数量（最大 200）
+    - **cursor**: 上一页返回的游标
+    - **search**: 按用户ID模糊搜索
+    """
+    stmt = select(
+        ProfileRecord.user_id,
+        ProfileRecord.created_at,
+        ProfileRecord.updated_at,
+        ProfileRecord.total_interactions,
+        ProfileRecord.crisis_count,
+        ProfileRecord.intervention_count,
+        ProfileRecord.data_quality_score,
+    ).order_by(desc(ProfileRecord.updated_at), desc(ProfileRecord.user_id)).limit(limit)
+    if cursor:
+        stmt = stmt.where(
+            tuple_(ProfileRecord.updated_at, ProfileRecord.user_id) < _decode_profile_cursor(cursor)
+        )
+    if search:
+        stmt = stmt.where(ProfileRecord.user_id.contains(search, autoescape=True))
+    rows = (await db.execute(stmt)).all()
+
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_profile_cursor(last.updated_at, last.user_id)
+
+    return [ProfileSummary.model_construct(**row._mapping) for row in rows]
 
 
 @router.get("/profiles/{user_id}", response_model=ProfileDetail)
 async def get_profile(
     user_id: str,
-    _: bool = Depends(get_current_admin)
-) -> ProfileDetail:
+    _: bool = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
+) -> UTCORJSONResponse:
     """
     获取单个用户画像详情
 
     - **user_id**: 用户ID
     """
-    filename = f"{user_id}.json"
-    data = read_profile_file(filename)
+    blob = await db.scalar(select(ProfileRecord.data).where(ProfileRecord.user_id == user_id))
+    if blob is not None:
+        data = orjson.loads(blob)
+    else:
+        data = await asyncio.to_thread(read_profile_file, f"{user_id}.json")
 
     if not data:
         raise HTTPException(status_code=404, detail="用户画像不存在")
 
-    return ProfileDetail(
-        user_id=data.get('user_id', user_id),
-        created_at=data.get('created_at'),
-        updated_at=data.get('updated_at'),
-        total_interactions=data.get('total_interactions', 0),
-        crisis_count=data.get('crisis_count', 0),
-        intervention_count=data.get('intervention_count', 0),
-        avg_recovery_time=data.get('avg_recovery_time', 0.0),
-        data_quality_score=data.get('data_quality_score', 0.0),
-        emotion_baseline=data.get('emotion_baseline', {}),
-        emotion_trend=data.get('emotion_trend', {}),
-        personality=data.get('personality', {}),
-        risk_prediction=data.get('risk_prediction', {}),
-        snapshots=data.get('snapshots', [])[-10:]  # Only return last 10 snapshots
-    )
+    # 画像数据已是可直接序列化的 dict，绕过响应模型校验，由 orjson 直接输出
+    return UTCORJSONResponse(content={
+        'user_id': data.get('user_id', user_id),
+        'created_at': data.get('created_at'),
+        'updated_at': data.get('updated_at'),
+        'total_interactions': data.get('total_interactions', 0),
+        'crisis_count': data.get('crisis_count', 0),
+        'intervention_count': data.get('intervention_count', 0),
+        'avg_recovery_time': data.get('avg_recovery_time', 0.0),
+        'data_quality_score': data.get('data_quality_score', 0.0),
+        'emotion_baseline': data.get('emotion_baseline', {}),
+        'emotion_trend': data.get('emotion_trend', {}),
+        'personality': data.get('personality', {}),
+        'risk_prediction': data.get('risk_prediction', {}),
+        'snapshots': data.get('snapshots', [])[-10:]  # Only return last 10 snapshots
+    })
 
 
 @router.get("/dashboard", response_model=DashboardStats)
 async def get_dashboard_stats(
-    _: bool = Depends(get_current_admin)
+    _: bool = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
 ) -> DashboardStats:
     """
     获取仪表板统计数据
 
     汇总所有用户画像的统计信息
     """
-    total_profiles = 0
-    total_interactions = 0
-    total_crisis = 0
-    total_interventions = 0
-    total_quality = 0.0
-
-    for filename in get_all_profile_files():
-        data = read_profile_file(filename)
-        if not data:
-            continue
-
-        total_profiles += 1
-        total_interactions += data.get('total_interactions', 0)
-        total_crisis += data.get('crisis_count', 0)
-        total_interventions += data.get('intervention_count', 0)
-        total_quality += data.get('data_quality_score', 0.0)
+    return await _query_dashboard_stats(db)
 
-    return DashboardStats(
-        total_profiles=total_profiles,
-        total_interactions=total_interactions,
-        total_crisis=total_crisis,
-        total_interventions=total_interventions,
-        avg_data_quality=total_quality / total_profiles if total_profiles > 0 else 0.0
-    )
+
+@router.post("/rebuild-stats", response_model=DashboardStats)
+async def rebuild_dashboard_stats(
+    _: bool = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
+) -> DashboardStats:
+    """
+    重新扫描 profiles/ 目录，将画像文件导入数据库后返回统计
+    """
+    await asyncio.to_thread(import_profile_files, PROFILES_DIR)
+    return await _query_dashboard_stats(db)
@@ -1,14 +1,44 @@
-from typing import Optional, List
+from typing import Any, Optional, List, Iterator, AsyncIterator, Callable
+import asyncio
 import os
+import threading
 from camel.agents import ChatAgent
 from camel.messages import BaseMessage
 from camel.types import RoleType, ModelType, ModelPlatformType
 from camel.models import ModelFactory
 from camel.configs import ChatGPTConfig
+from camel.responses import ChatAgentResponse
 from app.models.data_models import UserInput
 from app.core.camel_tools import get_self_agent_tools
 from app.core.camel_emotion_tools import get_emotion_tools
 
+# Tools that only run on the intervention (L2) or crisis (L3) path
+_ESCALATION_TOOLS = frozenset({"recommend_dbt_skills", "handle_emergency_protocol"})
+
+
+def _is_low_risk(tool_calls: List[Any]) -> bool:
+    """
+    True only if the turn's tool calls include a risk assessment and every
+    assessment reported the quick path (L1, LOW risk, no crisis flag).
+    """
+    assessed = False
+    for record in tool_calls:
+        if record.tool_name in _ESCALATION_TOOLS:
+            return False
+        result = record.result
+        if not isinstance(result, dict) or "route_level" not in result:
+            continue
+        if (
+            "error" in result
+            or result.get("route_level") != "L1_QUICK"
+            or result.get("risk_level") != "LOW"
+            or result.get("crisis_flag")
+        ):
+            return False
+        assessed = True
+    return assessed
+
+
 class SelfAgent:
     """
     5.2 Self-Agent Core Control Hub (CAMEL-AI Implementation)
@@ -31,23 +61,50 @@ class SelfAgent:
         model_instance = ModelFactory.create(
             model_platform=ModelPlatformType.OPENAI,
             model_type=model_type,
-            model_config_dict=ChatGPTConfig(temperature=0.7).as_dict(),
+            model_config_dict=ChatGPTConfig(temperature=0.7, stream=True).as_dict(),
             url=api_base
         )
         self.agent = ChatAgent(
             system_message=self.system_message,
             model=model_instance,
-            tools=tools
+            tools=tools,
+            # Yield token deltas rather than the accumulated content so
+            # stream_interaction can forward them as-is.
+            stream_accumulate=False
         )
         
         # Keep track of conversation history internally if needed, 
         # but ChatAgent manages its own history.
         self.agent.reset()
 
+        # ChatAgent is stateful and not thread-safe; callers may run
+        # process_interaction in a worker thread, so serialize steps.
+        # This lock makes chat turns on the shared agent run one at a time
+        # (across all users); it is only held while the model produces the
+        # reply, never while a client is reading it.
+        self._step_lock = threading.Lock()
+
     def process_interaction(self, user_input: UserInput) -> str:
         """
         Process the user input using the CAMEL Agent.
         """
+        try:
+            content = "".join(self.stream_interaction(user_input))
+            return content or "I'm having trouble thinking right now."
+        except Exception as e:
+            # Fallback for errors (e.g., API key missing in test environment)
+            return f"System Error: {str(e)}"
+
+    def _run_step(self, user_input: UserInput, on_chunk: Callable[[str], None]):
+        """
+        Step the agent under the step lock, passing each content chunk of
+        the final answer to on_chunk as the model streams it. Tool calls
+        are resolved inside the agent step. on_chunk must not block: the
+        lock is held until the model stream is exhausted.
+
+        Sets user_input.metadata["risk_low"] to whether the turn's tool
+        calls assessed the input as low risk (see _is_low_risk).
+        """
         # Create a User Message
         user_msg = BaseMessage(
             role_name="User",
@@ -55,21 +112,71 @@ class SelfAgent:
             meta_dict=None,
             content=user_input.text or "(No text input)"
         )
-        
+
         # Step the agent
         # The agent will autonomously decide to call tools (Perception -> Logic -> Response)
-        try:
+        tool_calls = {}
+        user_input.metadata["risk_low"] = False
+        with self._step_lock:
             response = self.agent.step(user_msg)
-            
-            # The response object contains the agent's reply
-            if response.msgs:
-                content = response.msgs[0].content
-                # Simple filter to remove common internal logs if they leak into output
-                # (Though usually logs go to stderr, sometimes LLMs hallucinate them if context includes tool outputs)
-                return content
+
+            # Non-streaming backends return a single complete response
+            if isinstance(response, ChatAgentResponse):
+                chunks = [response]
             else:
-                return "I'm having trouble thinking right now."
-                
-        except Exception as e:
-            # Fallback for errors (e.g., API key missing in test environment)
-            return f"System Error: {str(e)}"
+                chunks = response
+
+            for chunk in chunks:
+                for record in chunk.info.get("tool_calls") or ():
+                    tool_calls[record.tool_call_id] = record
+                if chunk.msgs and chunk.msgs[0].content:
+                    on_chunk(chunk.msgs[0].content)
+
+        user_input.metadata["risk_low"] = _is_low_risk(list(tool_calls.values()))
+
+    def stream_interaction(self, user_input: UserInput) -> Iterator[str]:
+        """
+        Process the user input and yield the reply in the chunks the model
+        produced. The step runs to completion before the first chunk is
+        yielded, so a slow consumer never holds the step lock.
+        """
+        chunks: List[str] = []
+        self._run_step(user_input, chunks.append)
+        yield from chunks
+
+    async def aprocess_interaction(self, user_input: UserInput) -> str:
+        """
+        Async variant of process_interaction for use from request handlers.
+
+        The agent step (LLM calls plus tool execution) runs in a worker
+        thread: several tools make blocking HTTP calls or start their own
+        event loop, so they must not run on the server's loop.
+        """
+        return await asyncio.to_thread(self.process_interaction, user_input)
+
+    async def astream_interaction(self, user_input: UserInput) -> AsyncIterator[str]:
+        """
+        Async variant of stream_interaction that yields chunks as the model
+        streams them. The step runs in a worker thread and hands chunks to
+        the event loop through a queue, so the step lock is released as soon
+        as the model finishes, however slowly the client reads.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        def push(chunk: str):
+            loop.call_soon_threadsafe(queue.put_nowait, chunk)
+
+        step = asyncio.ensure_future(asyncio.to_thread(self._run_step, user_input, push))
+        # Scheduled after every push made by the worker thread
+        step.add_done_callback(lambda _: queue.put_nowait(done))
+        try:
+            while (chunk := await queue.get()) is not done:
+                yield chunk
+            await step
+        finally:
+            if not step.done():
+                # Consumer stopped early: the step finishes in the background;
+                # retrieve its outcome so a failure is not reported as unhandled
+                step.add_done_callback(lambda t: t.cancelled() or t.exception())
@@ -2,24 +2,52 @@
 JWT 认证相关工具
 """
 
-from datetime import datetime, timedelta
+import base64
+import hashlib
+import hmac
+import os
+import time
+from datetime import timedelta
+from functools import lru_cache
 from typing import Optional
-from jose import JWTError, jwt
+
+import orjson
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 from app.core.database import get_db
 from app.models.user_models import User, UserRole
 
 
 # JWT 配置
-SECRET_KEY = "your-secret-key-change-this-in-production"  # 应该从环境变量读取
+SECRET_KEY = os.getenv("JWT_SECRET", "your-secret-key-change-this-in-production")  # 生产环境务必设置 JWT_SECRET
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24小时
 
 # HTTP Bearer 认证
 security = HTTPBearer()
+_bearer_optional = HTTPBearer(auto_error=False)
+
+
+def _b64url_encode(data: bytes) -> bytes:
+    """base64url 编码（去掉填充）"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64url_decode(data: bytes) -> bytes:
+    """base64url 解码（补齐填充）"""
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+# 签名所需的密钥和 JWT 头在模块加载时预先计算
+_SECRET_BYTES = SECRET_KEY.encode("utf-8")
+_HEADER_B64 = _b64url_encode(orjson.dumps({"alg": ALGORITHM, "typ": "JWT"}))
+
+
+def _sign(signing_input: bytes) -> bytes:
+    """HS256 签名"""
+    return hmac.new(_SECRET_BYTES, signing_input, hashlib.sha256).digest()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -35,15 +63,64 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     """
     to_encode = data.copy()
 
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    if expires_delta is None:
+        expires_delta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode["exp"] = int(time.time() + expires_delta.total_seconds())
 
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    signing_input = _HEADER_B64 + b"." + _b64url_encode(orjson.dumps(to_encode))
+    token = signing_input + b"." + _b64url_encode(_sign(signing_input))
 
-    return encoded_jwt
+    return token.decode("ascii")
+
+
+@lru_cache(maxsize=8192)
+def _decode_signed(token: str) -> Optional[dict]:
+    """
+    校验 token 签名并解析 payload（按 token 缓存，不检查过期时间）
+
+    Returns:
+        payload；签名或格式无效时返回 None
+    """
+    try:
+        signing_input, _, signature_b64 = token.encode("ascii").rpartition(b".")
+        header_b64, _, payload_b64 = signing_input.partition(b".")
+
+        header = orjson.loads(_b64url_decode(header_b64))
+        if header.get("alg") != ALGORITHM:
+            return None
+
+        if not hmac.compare_digest(_sign(signing_input), _b64url_decode(signature_b64)):
+            return None
+
+        payload = orjson.loads(_b64url_decode(payload_b64))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+    if not isinstance(payload, dict):
+        return None
+
+    return payload
+
+
+def _verify_token(token: str) -> Optional[dict]:
+    """
+    校验 token 签名和过期时间
+
+    签名校验结果按 token 缓存，过期时间每次都重新检查。
+    返回的 payload 为缓存对象，调用方不应修改。
+
+    Returns:
+        解码后的数据；token 无效或过期时返回 None
+    """
+    payload = _decode_signed(token)
+    if payload is None:
+        return None
+
+    exp = payload.get("exp")
+    if exp is not None and (not isinstance(exp, (int, float)) or exp < time.time()):
+        return None
+
+    return payload
 
 
 def decode_access_token(token: str) -> dict:
@@ -59,15 +136,14 @@ def decode_access_token(token: str) -> dict:
     Raises:
         HTTPException: token 无效或过期
     """
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+    payload = _verify_token(token)
+    if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无效的认证凭据",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return payload
 
 
 def get_current_user(
@@ -98,7 +174,8 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.query(User).filter(User.id == user_id).first()
+    # 额度检查紧接着会读取 user.quota，一并加载，避免再查一次
+    user = db.query(User).options(joinedload(User.quota)).filter(User.id == user_id).first()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -140,24 +217,24 @@ class OptionalAuth:
     """可选认证依赖（允许未登录用户访问）"""
     async def __call__(
         self,
-        credentials: Optional[HTTPAuthorizationCredentials] = Depends(
-            HTTPBearer(auto_error=False)
-        ),
+        credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer_optional),
         db: Session = Depends(get_db)
     ) -> Optional[User]:
         if credentials is None:
             return None
 
         try:
-            token = credentials.credentials
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = _verify_token(credentials.credentials)
+            if payload is None:
+                return None
+
             user_id: int = payload.get("sub")
             if user_id is None:
                 return None
 
             user = db.query(User).filter(User.id == user_id).first()
             return user
-        except (JWTError, Exception):
+        except Exception:
             return None
 
 
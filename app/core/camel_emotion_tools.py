@@ -3,15 +3,46 @@ CAMEL情绪识别工具集成
 将情绪识别功能封装为CAMEL工具
 """
 
+import os
+from functools import lru_cache
 from typing import Dict, Any, Optional
+
+import cv2
+import numpy as np
 from camel.agents import ChatAgent
 from camel.messages import BaseMessage
 # from camel.toolkits import BaseTool # Removed: BaseTool does not exist in this version of CAMEL
 
 from app.modules.emotion import EmotionRecognitionEngine
+from app.core.camel_tools import get_shared_emotion_engine
 from loguru import logger
 
 
+@lru_cache(maxsize=32)
+def _decode_image(image_path: str, mtime_ns: int) -> Optional[np.ndarray]:
+    """
+    解码图像为 BGR 数组（按路径和修改时间缓存，重复分析同一图片时不再解码）
+
+    返回的数组为缓存对象，调用方不应原地修改。
+    """
+    return cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def _project_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """从 engine.analyze() 的结果中提取工具返回的字段"""
+    ef = result['emotion_features']
+    ia = result['intervention_assessment']
+    return {
+        'user_id': result['user_id'],
+        'emotions': ef['emotions'],
+        'arousal': ef['arousal'],
+        'route_level': result['routing_decision']['level'],
+        'risk_level': ia['risk_level'],
+        'requires_intervention': ia['triggered'],
+        'recommendations': result['recommendations']
+    }
+
+
 class EmotionRecognitionTool: # Removed inheritance from BaseTool
     """情绪识别工具 - CAMEL集成"""
 
@@ -29,8 +60,14 @@ class EmotionRecognitionTool: # Removed inheritance from BaseTool
     def _ensure_initialized(self):
         """确保引擎已初始化"""
         if not self._initialized:
-            logger.info("初始化情绪识别引擎...")
-            self.engine = EmotionRecognitionEngine(self.config)
+            if self.config is None:
+                # 使用默认配置时与其他工具共用同一个引擎
+                self.engine = get_shared_emotion_engine()
+                if self.engine is None:
+                    raise RuntimeError("情绪识别引擎初始化失败")
+            else:
+                logger.info("初始化情绪识别引擎...")
+                self.engine = EmotionRecognitionEngine(self.config)
             self._initialized = True
 
     def detect_emotion(
@@ -58,15 +95,7 @@ class EmotionRecognitionTool: # Removed inheritance from BaseTool
             context=context
         )
 
-        return {
-            'user_id': result['user_id'],
-            'emotions': result['emotion_features']['emotions'],
-            'arousal': result['emotion_features']['arousal'],
-            'route_level': result['routing_decision']['level'],
-            'risk_level': result['intervention_assessment']['risk_level'],
-            'requires_intervention': result['intervention_assessment']['triggered'],
-            'recommendations': result['recommendations']
-        }
+        return _project_result(result)
 
     def analyze_audio_emotion(
         self,
@@ -94,15 +123,7 @@ class EmotionRecognitionTool: # Removed inheritance from BaseTool
             context=context
         )
 
-        return {
-            'user_id': result['user_id'],
-            'emotions': result['emotion_features']['emotions'],
-            'arousal': result['emotion_features']['arousal'],
-            'route_level': result['routing_decision']['level'],
-            'risk_level': result['intervention_assessment']['risk_level'],
-            'requires_intervention': result['intervention_assessment']['triggered'],
-            'recommendations': result['recommendations']
-        }
+        return _project_result(result)
 
     def analyze_image_emotion(
         self,
@@ -123,8 +144,7 @@ class EmotionRecognitionTool: # Removed inheritance from BaseTool
         """
         self._ensure_initialized()
 
-        import cv2
-        frame = cv2.imread(image_path)
+        frame = _decode_image(image_path, os.stat(image_path).st_mtime_ns)
 
         result = self.engine.analyze(
             text="[图像输入]",
@@ -133,15 +153,7 @@ class EmotionRecognitionTool: # Removed inheritance from BaseTool
             context=context
         )
 
-        return {
-            'user_id': result['user_id'],
-            'emotions': result['emotion_features']['emotions'],
-            'arousal': result['emotion_features']['arousal'],
-            'route_level': result['routing_decision']['level'],
-            'risk_level': result['intervention_assessment']['risk_level'],
-            'requires_intervention': result['intervention_assessment']['triggered'],
-            'recommendations': result['recommendations']
-        }
+        return _project_result(result)
 
     def get_user_profile(self, user_id: str) -> Dict[str, Any]:
         """
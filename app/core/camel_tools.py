@@ -3,7 +3,11 @@ Self-Agent CAMEL工具集成
 整合情绪识别、DBT技能推荐、紧急协议等所有工具
 """
 
-from typing import Dict, Any, Optional
+import asyncio
+import threading
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Dict, Any, Optional, Tuple
 from camel.toolkits import BaseToolkit
 from loguru import logger
 
@@ -12,23 +16,77 @@ from app.modules.emotion import EmotionRecognitionEngine
 from app.modules.emotion.config_loader import EmotionConfigLoader
 
 
-class EmotionDetectionTool(BaseToolkit):
-    """情绪检测工具"""
+# 进程内共享的情绪识别引擎（加载模型开销大，所有工具共用一个实例）
+# 初始化只尝试一次：失败后不再重试，避免每次工具调用都重新加载模型
+_ENGINE_STATUS: Dict[str, Any] = {"tried": False, "engine": None}
+_ENGINE_LOCK = threading.Lock()
 
-    def __init__(self):
-        self.engine = None
+
+def get_shared_emotion_engine() -> Optional[EmotionRecognitionEngine]:
+    """
+    获取共享的情绪识别引擎，首次调用时初始化
+
+    Returns:
+        引擎实例；初始化失败时返回 None
+    """
+    if not _ENGINE_STATUS["tried"]:
+        with _ENGINE_LOCK:
+            if not _ENGINE_STATUS["tried"]:
+                try:
+                    config_loader = EmotionConfigLoader()
+                    _ENGINE_STATUS["engine"] = EmotionRecognitionEngine(config_loader.get_config())
+                    logger.info("情绪识别引擎初始化成功")
+                except Exception as e:
+                    logger.error(f"情绪识别引擎初始化失败: {e}")
+                finally:
+                    _ENGINE_STATUS["tried"] = True
+    return _ENGINE_STATUS["engine"]
+
+
+class _SharedEngineMixin:
+    """使用共享情绪识别引擎的工具"""
+
+    engine: Optional[EmotionRecognitionEngine] = None
 
     def _ensure_engine(self):
-        """确保引擎已初始化"""
+        """确保引擎已初始化（初始化失败时 engine 保持为 None）"""
         if self.engine is None:
-            try:
-                config_loader = EmotionConfigLoader()
-                self.engine = EmotionRecognitionEngine(config_loader.get_config())
-                logger.info("情绪识别引擎初始化成功")
-            except Exception as e:
-                logger.error(f"情绪识别引擎初始化失败: {e}")
-                # 创建空引擎作为后备
-                self.engine = None
+            self.engine = get_shared_emotion_engine()
+
+
+# detect_emotion_and_risk 的后备结果模板（返回浅拷贝，嵌套值共享，调用方只读）
+_FALLBACK_RESULT: Dict[str, Any] = {
+    'emotions': {},
+    'dominant_emotion': 'unknown',
+    'arousal': 0.0,
+    'route_level': 'L1_QUICK',
+    'risk_level': 'LOW',
+    'triggered': False,
+    'crisis_flag': False,
+    'recommendations': ['情绪识别引擎未初始化']
+}
+
+_ERROR_RESULT_TEMPLATE: Dict[str, Any] = {
+    'emotions': {},
+    'dominant_emotion': 'error',
+    'arousal': 0.0,
+    'route_level': 'L1_QUICK',
+    'risk_level': 'LOW',
+    'triggered': False,
+    'crisis_flag': False
+}
+
+
+def _dominant_emotion(emotions: Dict[str, float]) -> str:
+    """得分最高的情绪（无情绪数据时为 neutral）"""
+    return max(emotions, key=emotions.get) if emotions else 'neutral'
+
+
+class EmotionDetectionTool(_SharedEngineMixin, BaseToolkit):
+    """情绪检测工具"""
+
+    def __init__(self):
+        self.engine = None
 
     def detect_emotion_and_risk(
         self,
@@ -49,16 +107,7 @@ class EmotionDetectionTool(BaseToolkit):
 
         if self.engine is None:
             # 后备方案：返回基础分析
-            return {
-                'emotions': {},
-                'dominant_emotion': 'unknown',
-                'arousal': 0.0,
-                'route_level': 'L1_QUICK',
-                'risk_level': 'LOW',
-                'triggered': False,
-                'crisis_flag': False,
-                'recommendations': ['情绪识别引擎未初始化']
-            }
+            return dict(_FALLBACK_RESULT)
 
         try:
             result = self.engine.analyze(
@@ -68,7 +117,7 @@ class EmotionDetectionTool(BaseToolkit):
             )
 
             emotions = result['emotion_features']['emotions']
-            dominant_emotion = max(emotions.items(), key=lambda x: x[1])[0] if emotions else 'neutral'
+            dominant_emotion = _dominant_emotion(emotions)
 
             return {
                 'emotions': emotions,
@@ -84,16 +133,7 @@ class EmotionDetectionTool(BaseToolkit):
             }
         except Exception as e:
             logger.error(f"情绪检测失败: {e}")
-            return {
-                'emotions': {},
-                'dominant_emotion': 'error',
-                'arousal': 0.0,
-                'route_level': 'L1_QUICK',
-                'risk_level': 'LOW',
-                'triggered': False,
-                'crisis_flag': False,
-                'error': str(e)
-            }
+            return {**_ERROR_RESULT_TEMPLATE, 'error': str(e)}
 
     def analyze_user_emotion(self, text: str, user_id: str = "default_user") -> Dict[str, Any]:
         """
@@ -115,7 +155,7 @@ class EmotionDetectionTool(BaseToolkit):
         try:
             result = self.engine.analyze(text=text, user_id=user_id)
             emotions = result['emotion_features']['emotions']
-            dominant = max(emotions.items(), key=lambda x: x[1])[0] if emotions else "neutral"
+            dominant = _dominant_emotion(emotions)
             
             return {
                 "emotions": emotions,
@@ -127,22 +167,72 @@ class EmotionDetectionTool(BaseToolkit):
             return {"error": str(e)}
 
 
+# 风险等级对应的紧急度（未列出的等级为 0.5）
+_URGENCY_SCORES = {"CRITICAL": 0.8}
+
+
+@lru_cache(maxsize=1)
+def _dbt_deps() -> SimpleNamespace:
+    """DBT 模块依赖（延迟导入以避免循环依赖，首次调用后缓存）"""
+    from app.modules.dbt.models.schemas import (
+        RecommendRequest, EmotionInput, InterventionAssessment,
+        TriggerSignals
+    )
+    from app.modules.dbt.models.enums import RiskLevel as DBTRiskLevel
+    from app.modules.dbt.repositories.skill_repository import SkillRepository
+    from app.modules.dbt.services.recommendation_engine import RecommendationEngine
+
+    return SimpleNamespace(
+        # 映射风险等级
+        risk_map={
+            "LOW": DBTRiskLevel.LOW,
+            "MEDIUM": DBTRiskLevel.MEDIUM,
+            "HIGH": DBTRiskLevel.HIGH,
+            "CRITICAL": DBTRiskLevel.CRITICAL
+        },
+        RecommendRequest=RecommendRequest,
+        EmotionInput=EmotionInput,
+        InterventionAssessment=InterventionAssessment,
+        TriggerSignals=TriggerSignals,
+        DBTRiskLevel=DBTRiskLevel,
+        SkillRepository=SkillRepository,
+        RecommendationEngine=RecommendationEngine
+    )
+
+
 class DBTSkillsTool(BaseToolkit):
     """DBT技能推荐工具 - 集成版"""
 
+    # 单次推荐的最长等待时间（秒）
+    RECOMMEND_TIMEOUT = 30
+
     def __init__(self):
         # 延迟导入以避免循环依赖和初始化问题
         self.recommendation_engine = None
         self.skill_repository = None
         self.session_factory = None
+        self._init_lock = asyncio.Lock()
+
+        # 工具是同步调用的：所有异步操作都提交到这个常驻的后台事件循环，
+        # 数据库引擎及其连接只绑定这一个循环，跨调用复用
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="dbt-tool-loop", daemon=True).start()
 
     async def _ensure_initialized(self):
-        """确保推荐引擎已初始化"""
+        """确保推荐引擎已初始化（每个进程只执行一次）"""
         if self.recommendation_engine is not None:
             return
 
+        async with self._init_lock:
+            if self.recommendation_engine is None:
+                await self._initialize()
+
+    async def _initialize(self):
+        """创建内存数据库并初始化推荐引擎"""
         try:
+            from sqlalchemy import event
             from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+            from sqlalchemy.pool import StaticPool
             from app.modules.dbt.models.database import Base
             from app.modules.dbt.repositories.skill_repository import SkillRepository
             from app.modules.dbt.services.recommendation_engine import RecommendationEngine
@@ -150,7 +240,21 @@ class DBTSkillsTool(BaseToolkit):
 
             settings = get_settings()
             # 使用内存数据库作为演示，实际应使用持久化数据库
-            engine = create_async_engine("sqlite+aiosqlite:///:memory:", echo=False)
+            # StaticPool 让所有会话共用同一个连接，内存库的数据和页缓存在调用之间保留
+            engine = create_async_engine(
+                "sqlite+aiosqlite:///:memory:",
+                echo=False,
+                poolclass=StaticPool,
+                connect_args={"check_same_thread": False}
+            )
+
+            @event.listens_for(engine.sync_engine, "connect")
+            def _set_memory_pragmas(dbapi_connection, connection_record):
+                # 内存库不落盘：关闭同步，临时表也放在内存中
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA synchronous=OFF")
+                cursor.execute("PRAGMA temp_store=MEMORY")
+                cursor.close()
             
             async with engine.begin() as conn:
                 await conn.run_sync(Base.metadata.create_all)
@@ -239,12 +343,14 @@ class DBTSkillsTool(BaseToolkit):
         Returns:
             推荐的DBT技能列表和指导
         """
-        # 由于CAMEL工具目前是同步调用，我们需要在同步上下文中运行异步代码
-        import asyncio
-        
+        # 由于CAMEL工具目前是同步调用，异步代码提交到后台事件循环执行
+        future = asyncio.run_coroutine_threadsafe(
+            self._async_recommend(emotions, risk_level, dominant_emotion), self._loop
+        )
         try:
-            return asyncio.run(self._async_recommend(emotions, risk_level, dominant_emotion))
+            return future.result(timeout=self.RECOMMEND_TIMEOUT)
         except Exception as e:
+            future.cancel()
             logger.error(f"DBT推荐失败: {e}")
             return {
                 'recommended_skills': [],
@@ -264,44 +370,31 @@ class DBTSkillsTool(BaseToolkit):
         if not self.session_factory:
             return {'error': 'DBT引擎未初始化'}
 
-        from app.modules.dbt.models.schemas import (
-            RecommendRequest, EmotionInput, InterventionAssessment, 
-            TriggerSignals
-        )
-        from app.modules.dbt.models.enums import RiskLevel as DBTRiskLevel
-        from app.modules.dbt.repositories.skill_repository import SkillRepository
-        from app.modules.dbt.services.recommendation_engine import RecommendationEngine
+        d = _dbt_deps()
 
-        # 映射风险等级
-        risk_map = {
-            "LOW": DBTRiskLevel.LOW,
-            "MEDIUM": DBTRiskLevel.MEDIUM,
-            "HIGH": DBTRiskLevel.HIGH,
-            "CRITICAL": DBTRiskLevel.CRITICAL
-        }
         
         # 构建请求对象
         # 计算arousal (如果没有提供，使用最大情绪值作为估算)
         arousal = max(emotions.values()) if emotions else 0.5
         
-        request = RecommendRequest(
-            emotion_input=EmotionInput(
+        request = d.RecommendRequest(
+            emotion_input=d.EmotionInput(
                 emotions=emotions,
                 arousal=arousal
             ),
-            intervention_assessment=InterventionAssessment(
+            intervention_assessment=d.InterventionAssessment(
                 triggered=risk_level != "LOW",
-                risk_level=risk_map.get(risk_level, DBTRiskLevel.LOW),
-                urgency_score=0.8 if risk_level == "CRITICAL" else 0.5,
-                trigger_signals=TriggerSignals(),
+                risk_level=d.risk_map.get(risk_level, d.DBTRiskLevel.LOW),
+                urgency_score=_URGENCY_SCORES.get(risk_level, 0.5),
+                trigger_signals=d.TriggerSignals(),
                 intervention_reason=f"Detected {dominant_emotion}"
             ),
             context=f"Primary emotion: {dominant_emotion}"
         )
 
         async with self.session_factory() as session:
-            repo = SkillRepository(session)
-            engine = RecommendationEngine(repo)
+            repo = d.SkillRepository(session)
+            engine = d.RecommendationEngine(repo)
             
             result = await engine.recommend(request)
             
@@ -323,6 +416,73 @@ class DBTSkillsTool(BaseToolkit):
 
 
 
+# 紧急响应内容在模块加载时拼接好，调用时直接按危机类型查表
+_EMERGENCY_MSG_HEADER = """
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+           🚨 紧急支持协议 🚨
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+我非常关心您的安全。您现在的感受很重要，
+请让我帮助您获得专业的支持。
+
+【立即行动】
+"""
+
+_EMERGENCY_MSG: Dict[str, str] = {
+    "suicide": _EMERGENCY_MSG_HEADER + """
+📞 24小时心理援助热线：
+   • 全国心理援助热线：400-161-9995
+   • 北京危机干预热线：010-82951332
+   • 希望24热线：400-161-9995
+
+【重要提醒】
+• 您不是一个人
+• 这种感觉会过去
+• 请给自己一个机会
+• 专业帮助可以带来改变
+
+【请立即】
+1. 拨打上述热线
+2. 联系家人或朋友
+3. 前往最近医院急诊科
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+""",
+    "self_harm": _EMERGENCY_MSG_HEADER + """
+📞 请立即联系：
+   • 心理援助热线：400-161-9995
+   • 您的信任的人
+
+【替代方案】
+• 使用TIPP技能（握住冰块、剧烈运动）
+• 切换环境：离开当前场所
+• 延迟行动：等待15分钟再决定
+
+【您值得被帮助】
+请联系专业心理咨询师
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+""",
+    "default": _EMERGENCY_MSG_HEADER + """
+请根据您的具体情况联系专业帮助。
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+""",
+}
+
+_IMMEDIATE_ACTIONS = (
+    '⚠️ 请立即停止任何危险行为',
+    '📞 马上拨打以下热线电话',
+    '👥 联系您信任的人（家人、朋友）',
+    '🏥 如果情况紧急，直接前往最近的医院急诊科'
+)
+
+_SAFETY_PLAN = (
+    '1. 环境安全：移除所有可能造成伤害的物品',
+    '2. 陪伴支持：不要独处，找信任的人陪伴',
+    '3. 专业帮助：尽快联系心理医生或精神科医生',
+    '4. 后续跟进：预约心理咨询，持续获得支持'
+)
+
+
 class EmergencyProtocolTool(BaseToolkit):
     """紧急协议工具"""
 
@@ -345,6 +505,15 @@ class EmergencyProtocolTool(BaseToolkit):
                 'description': '24小时自杀预防热线'
             }
         }
+        # 返回给调用方的联系人列表只构建一次
+        self._contacts_list = [
+            {
+                'name': contact_info['name'],
+                'number': contact_info['number'],
+                'description': contact_info['description']
+            }
+            for contact_info in self.emergency_contacts.values()
+        ]
 
     def handle_emergency_protocol(
         self,
@@ -361,116 +530,29 @@ class EmergencyProtocolTool(BaseToolkit):
         Returns:
             紧急响应和联系信息
         """
-        response = {
+        return {
             'alert_level': 'CRITICAL',
-            'immediate_actions': [],
-            'contacts': [],
-            'safety_plan': [],
-            'message': ''
+            # 立即行动
+            'immediate_actions': list(_IMMEDIATE_ACTIONS),
+            # 联系信息
+            'contacts': list(self._contacts_list),
+            # 安全计划
+            'safety_plan': list(_SAFETY_PLAN),
+            # 紧急消息
+            'message': self._generate_emergency_message(crisis_type)
         }
 
-        # 立即行动
-        response['immediate_actions'] = [
-            '⚠️ 请立即停止任何危险行为',
-            '📞 马上拨打以下热线电话',
-            '👥 联系您信任的人（家人、朋友）',
-            '🏥 如果情况紧急，直接前往最近的医院急诊科'
-        ]
-
-        # 联系信息
-        for contact_type, contact_info in self.emergency_contacts.items():
-            response['contacts'].append({
-                'name': contact_info['name'],
-                'number': contact_info['number'],
-                'description': contact_info['description']
-            })
-
-        # 安全计划
-        response['safety_plan'] = [
-            '1. 环境安全：移除所有可能造成伤害的物品',
-            '2. 陪伴支持：不要独处，找信任的人陪伴',
-            '3. 专业帮助：尽快联系心理医生或精神科医生',
-            '4. 后续跟进：预约心理咨询，持续获得支持'
-        ]
-
-        # 紧急消息
-        response['message'] = self._generate_emergency_message(crisis_type)
-
-        return response
-
     def _generate_emergency_message(self, crisis_type: str) -> str:
         """生成紧急响应消息"""
-        base_message = """
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-           🚨 紧急支持协议 🚨
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+        return _EMERGENCY_MSG.get(crisis_type, _EMERGENCY_MSG["default"])
 
-我非常关心您的安全。您现在的感受很重要，
-请让我帮助您获得专业的支持。
-
-【立即行动】
-"""
 
-        if crisis_type == "suicide":
-            base_message += """
-📞 24小时心理援助热线：
-   • 全国心理援助热线：400-161-9995
-   • 北京危机干预热线：010-82951332
-   • 希望24热线：400-161-9995
-
-【重要提醒】
-• 您不是一个人
-• 这种感觉会过去
-• 请给自己一个机会
-• 专业帮助可以带来改变
-
-【请立即】
-1. 拨打上述热线
-2. 联系家人或朋友
-3. 前往最近医院急诊科
-
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-"""
-        elif crisis_type == "self_harm":
-            base_message += """
-📞 请立即联系：
-   • 心理援助热线：400-161-9995
-   • 您的信任的人
-
-【替代方案】
-• 使用TIPP技能（握住冰块、剧烈运动）
-• 切换环境：离开当前场所
-• 延迟行动：等待15分钟再决定
-
-【您值得被帮助】
-请联系专业心理咨询师
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-"""
-        else:
-            base_message += """
-请根据您的具体情况联系专业帮助。
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-"""
-
-        return base_message
-
-
-class UserProfileTool(BaseToolkit):
+class UserProfileTool(_SharedEngineMixin, BaseToolkit):
     """用户画像工具"""
 
     def __init__(self):
         self.engine = None
 
-    def _ensure_engine(self):
-        """确保引擎已初始化"""
-        if self.engine is None:
-            try:
-                config_loader = EmotionConfigLoader()
-                self.engine = EmotionRecognitionEngine(config_loader.get_config())
-            except Exception as e:
-                logger.error(f"用户画像工具初始化失败: {e}")
-                self.engine = None
-
     def get_user_profile(
         self,
         user_id: str = "default_user"
@@ -543,28 +625,36 @@ _emotion_tool = None
 _dbt_tool = None
 _emergency_tool = None
 _profile_tool = None
+_TOOLS_CACHE: Optional[Tuple] = None
+_TOOLS_LOCK = threading.Lock()
 
 
 def get_self_agent_tools() -> list:
     """
     获取Self-Agent的所有工具
 
+    工具实例在首次调用时创建（加锁避免并发重复创建），之后返回缓存的方法列表。
+
     Returns:
         工具函数列表
     """
-    global _emotion_tool, _dbt_tool, _emergency_tool, _profile_tool
-
-    if _emotion_tool is None:
-        _emotion_tool = EmotionDetectionTool()
-        _dbt_tool = DBTSkillsTool()
-        _emergency_tool = EmergencyProtocolTool()
-        _profile_tool = UserProfileTool()
-
-    return [
-        _emotion_tool.detect_emotion_and_risk,
-        _emotion_tool.analyze_user_emotion, # New tool registered
-        _dbt_tool.recommend_dbt_skills,
-        _emergency_tool.handle_emergency_protocol,
-        _profile_tool.get_user_profile,
-        _profile_tool.get_emotion_report
-    ]
+    global _emotion_tool, _dbt_tool, _emergency_tool, _profile_tool, _TOOLS_CACHE
+
+    if _TOOLS_CACHE is None:
+        with _TOOLS_LOCK:
+            if _TOOLS_CACHE is None:
+                _emotion_tool = EmotionDetectionTool()
+                _dbt_tool = DBTSkillsTool()
+                _emergency_tool = EmergencyProtocolTool()
+                _profile_tool = UserProfileTool()
+
+                _TOOLS_CACHE = (
+                    _emotion_tool.detect_emotion_and_risk,
+                    _emotion_tool.analyze_user_emotion, # New tool registered
+                    _dbt_tool.recommend_dbt_skills,
+                    _emergency_tool.handle_emergency_protocol,
+                    _profile_tool.get_user_profile,
+                    _profile_tool.get_emotion_report
+                )
+
+    return list(_TOOLS_CACHE)
@@ -2,10 +2,13 @@
 数据库连接和会话管理
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import NullPool
-from typing import Generator
+from typing import AsyncGenerator, Generator
 import os
 from loguru import logger
 
@@ -16,18 +19,83 @@ DATABASE_URL = os.getenv(
     "sqlite:///./data/sql_app.db"
 )
 
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
 # SQLite 需要特殊的 connect_args
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+connect_args = {"check_same_thread": False} if IS_SQLITE else {}
+
+# 连接池配置（按并发量调整；默认 5 + 10 在聊天与管理请求并发时容易排队等待连接）
+if os.getenv("DB_NULL_POOL", "false").lower() == "true":
+    # 命令行脚本等短生命周期进程：不保留连接
+    pool_kwargs = {"poolclass": NullPool}
+elif not IS_SQLITE:
+    pool_kwargs = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "40")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        # 定期回收连接以避开服务端超时断开；默认不做 pre-ping，省去每次取连接时的 SELECT 1
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "false").lower() == "true",
+    }
+elif make_url(DATABASE_URL).database not in (None, "", ":memory:"):
+    # SQLite 文件库同样复用连接（保持页缓存，避免每个请求重新打开文件）
+    pool_kwargs = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    }
+else:
+    pool_kwargs = {}
 
 # 创建数据库引擎
 engine = create_engine(
     DATABASE_URL,
     connect_args=connect_args,
     echo=False,  # 设置为 True 可查看 SQL 日志
+    **pool_kwargs
 )
 
 # 创建会话工厂
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False：提交后读取对象属性不再触发重新查询
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# 异步引擎（供聊天等高并发接口使用，避免阻塞事件循环）
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+_url = make_url(DATABASE_URL)
+ASYNC_DATABASE_URL = _url.set(
+    drivername=f"{_url.get_backend_name()}+{ASYNC_DRIVERS.get(_url.get_backend_name(), _url.get_driver_name())}"
+)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    **pool_kwargs
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    SQLite 连接建立时设置 PRAGMA
+
+    WAL 允许读写并发（同步与异步引擎同时访问同一文件），
+    synchronous=NORMAL 在 WAL 下仍可保证一致性，cache_size 为负数表示 KiB。
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -43,6 +111,12 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """获取异步数据库会话（依赖注入）"""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
 def init_db():
     """初始化数据库表"""
     from app.models.user_models import User, UserQuota, UsageRecord, ChatMessage
@@ -54,19 +128,67 @@ def init_db():
     # 创建所有表
     UserBase.metadata.create_all(bind=engine)
     DBTBase.metadata.create_all(bind=engine)
+    _sync_server_defaults(UserBase.metadata)
 
     logger.info("Database tables created successfully")
 
 
+def _sync_server_defaults(metadata):
+    """
+    为已有表补上模型中声明的列默认值（server_default）
+
+    create_all 不会修改已存在的表。ORM 写入由 Python 端 default 赋值，数据库默认值
+    只服务于绕过 ORM 的写入：PostgreSQL 直接 ALTER 补上，SQLite 不支持修改默认值，仅记录日志。
+    """
+    inspector = inspect(engine)
+    statements = []
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {col["name"]: col.get("default") for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.server_default is None or existing.get(column.name, "") is not None:
+                continue
+            if engine.dialect.name != "postgresql":
+                logger.info(f"{table.name}.{column.name} 缺少数据库默认值（ORM 写入使用 Python 端默认值）")
+                continue
+            default_sql = column.server_default.arg.compile(dialect=engine.dialect)
+            statements.append(f'ALTER TABLE {table.name} ALTER COLUMN {column.name} SET DEFAULT {default_sql}')
+
+    if statements:
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+        logger.info(f"Added {len(statements)} missing column defaults")
+
+
+def is_unique_violation(exc: IntegrityError, column: str) -> bool:
+    """
+    判断 IntegrityError 是否由指定列的唯一约束引起
+
+    各数据库的错误信息中都会带上列名或约束/索引名（如 users.email、ix_users_email），
+    NOT NULL、外键等其它约束失败时返回 False，调用方不应把它们当作重复值处理。
+    """
+    message = str(exc.orig).lower()
+    return ("unique" in message or "duplicate" in message) and column.lower() in message
+
+
 def create_default_admin(db: Session, email: str = "admin@selfagent.com", password: str = "admin123"):
-    """创建默认管理员账户"""
+    """
+    创建默认管理员账户
+
+    Returns:
+        管理员用户 ID（已存在时直接返回，不加载完整用户对象）
+    """
     from app.models.user_models import User, UserQuota, UserRole, get_password_hash
 
-    # 检查是否已存在管理员
-    existing_admin = db.query(User).filter(User.email == email).first()
-    if existing_admin:
+    # 检查是否已存在管理员（只查询 id）
+    existing_id = db.execute(
+        select(User.id).where(User.email == email).limit(1)
+    ).scalar_one_or_none()
+    if existing_id is not None:
         logger.info(f"Admin user already exists: {email}")
-        return existing_admin
+        return existing_id
 
     # 创建管理员
     admin = User(
@@ -90,7 +212,7 @@ def create_default_admin(db: Session, email: str = "admin@selfagent.com", passwo
 
     db.commit()
     logger.info(f"Default admin user created: {email} / {password}")
-    return admin
+    return admin.id
 
 
 if __name__ == "__main__":
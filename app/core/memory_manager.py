@@ -1,63 +1,177 @@
 import os
-import json
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
 from datetime import datetime
 from loguru import logger
 from app.core.agent import SelfAgent  # For summarization if needed
 
+
+_ID_COUNTER = itertools.count()
+
+
+@lru_cache(maxsize=8)
+def _get_client(persist_path: str):
+    """每个持久化目录只打开一次 PersistentClient（打开时需加载索引）"""
+    return chromadb.PersistentClient(path=persist_path)
+
+
+@lru_cache(maxsize=8)
+def _get_collection(persist_path: str):
+    """获取（或创建）记忆集合及其 embedding 函数"""
+    embedding_function = DefaultEmbeddingFunction()
+    collection = _get_client(persist_path).get_or_create_collection(
+        name="user_memories",
+        metadata={"hnsw:space": "cosine"},
+        embedding_function=embedding_function
+    )
+    return collection, embedding_function
+
+
 class MemoryManager:
+    # 缓冲达到该条数时批量写入 Chroma
+    BUFFER_MAX = 32
+    # 查询向量 / 检索结果缓存的最大条数
+    SEARCH_CACHE_MAX = 256
+    # 摘要：输入对话最多保留的字符数、输出 token 上限、等待超时（秒）
+    SUMMARY_INPUT_MAX_CHARS = 8000
+    SUMMARY_MAX_TOKENS = 512
+    SUMMARY_TIMEOUT = 20
+
     def __init__(self, persist_path: str = "./data/chroma_db"):
-        """Initialize ChromaDB client"""
-        self.client = chromadb.PersistentClient(path=persist_path)
+        """Initialize ChromaDB client (shared per persist_path)"""
+        self.client = _get_client(persist_path)
         
         # Create or get collection for user memories
-        self.collection = self.client.get_or_create_collection(
-            name="user_memories",
-            metadata={"hnsw:space": "cosine"}
-        )
+        # 显式持有 embedding 函数，检索时可自行计算查询向量并缓存
+        self.collection, self._embedding_function = _get_collection(persist_path)
+
+        # 待写入的 (content, metadata, id)，批量 add 时 embedding 只计算一次
+        self._buf: List[tuple] = []
+        self._buf_lock = threading.Lock()
+
+        # query -> 查询向量；(user_id, query, limit) -> 检索结果（该用户有新写入时失效）
+        self._embedding_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._result_cache: "OrderedDict[tuple, List[Dict]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
         
     def add_memory(self, user_id: str, content: str, role: str, metadata: Dict[str, Any] = None):
-        """Add a new memory entry"""
-        if metadata is None:
-            metadata = {}
-            
-        metadata.update({
+        """Add a new memory entry (buffered; flushed in batches of BUFFER_MAX)"""
+        self.add_memories_batch([{
             "user_id": user_id,
+            "content": content,
             "role": role,
-            "timestamp": datetime.now().isoformat(),
-            "type": "conversation"
-        })
-        
-        # ID generation
-        memory_id = f"{user_id}_{datetime.now().timestamp()}"
-        
+            "metadata": metadata
+        }])
+
+    def add_memories_batch(self, items: List[Dict[str, Any]]):
+        """
+        Add several memory entries at once
+
+        Args:
+            items: [{"user_id", "content", "role", "metadata"(可选)}]
+        """
+        timestamp = datetime.now().isoformat()
+        entries = []
+        for item in items:
+            metadata = dict(item.get("metadata") or {})
+            metadata.update({
+                "user_id": item["user_id"],
+                "role": item["role"],
+                "timestamp": timestamp,
+                "type": "conversation"
+            })
+            # ID generation（纳秒时间戳 + 进程内计数器，同一批次内也不会重复）
+            memory_id = f"{item['user_id']}_{time.time_ns()}_{next(_ID_COUNTER)}"
+            entries.append((item["content"], metadata, memory_id))
+
+        with self._buf_lock:
+            self._buf.extend(entries)
+            if len(self._buf) < self.BUFFER_MAX:
+                return
+            batch, self._buf = self._buf, []
+        self._write(batch)
+
+    def flush(self):
+        """Write all buffered memories to Chroma (call at session end / shutdown)"""
+        with self._buf_lock:
+            batch, self._buf = self._buf, []
+        self._write(batch)
+
+    def _write(self, batch: List[tuple]):
+        """一次 collection.add 写入整批记忆"""
+        if not batch:
+            return
+        documents, metadatas, ids = map(list, zip(*batch))
         self.collection.add(
-            documents=[content],
-            metadatas=[metadata],
-            ids=[memory_id]
+            documents=documents,
+            metadatas=metadatas,
+            ids=ids
         )
-        logger.info(f"Added memory for user {user_id}: {content[:50]}...")
+        logger.info("Added {} memories to vector store", len(batch))
+
+        user_ids = {metadata["user_id"] for _, metadata, _ in batch}
+        with self._cache_lock:
+            for key in [k for k in self._result_cache if k[0] in user_ids]:
+                del self._result_cache[key]
+
+    def _cache_get(self, cache: OrderedDict, key):
+        with self._cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _cache_put(self, cache: OrderedDict, key, value):
+        with self._cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            if len(cache) > self.SEARCH_CACHE_MAX:
+                cache.popitem(last=False)
+
+    def _embed_query(self, query: str) -> List[float]:
+        """计算查询向量（按查询文本缓存，重复查询不再调用 embedding 模型）"""
+        embedding = self._cache_get(self._embedding_cache, query)
+        if embedding is None:
+            embedding = [float(x) for x in self._embedding_function([query])[0]]
+            self._cache_put(self._embedding_cache, query, embedding)
+        return embedding
 
     def search_memory(self, user_id: str, query: str, limit: int = 5) -> List[Dict]:
         """Semantic search for memories"""
+        # 先写入缓冲中的记忆，保证检索能看到（写入会使该用户的结果缓存失效）
+        self.flush()
+
+        cache_key = (user_id, query, limit)
+        cached = self._cache_get(self._result_cache, cache_key)
+        if cached is not None:
+            return list(cached)
+
         results = self.collection.query(
-            query_texts=[query],
+            query_embeddings=[self._embed_query(query)],
             n_results=limit,
             where={"user_id": user_id}
         )
         
         memories = []
         if results["documents"]:
-            for i, doc in enumerate(results["documents"][0]):
-                memories.append({
-                    "content": doc,
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results["distances"][0][i] if results["distances"] else 0
-                })
-        
-        return memories
+            docs = results["documents"][0]
+            metas = results["metadatas"][0]
+            dists = results["distances"][0] if results["distances"] else [0] * len(docs)
+            memories = [
+                {"content": doc, "metadata": meta, "distance": dist}
+                for doc, meta, dist in zip(docs, metas, dists)
+            ]
+
+        self._cache_put(self._result_cache, cache_key, memories)
+        return list(memories)
 
     def get_recent_memories(self, user_id: str, limit: int = 10) -> List[Dict]:
         """Get most recent memories (simple retrieval by timestamp not supported natively efficiently in all vector DBs, 
@@ -80,8 +194,9 @@ class MemoryManager:
         if not history_messages:
             return
 
-        # Prepare text for summarization
+        # Prepare text for summarization (只保留最近的部分，限制 prompt 长度)
         conversation_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history_messages])
+        conversation_text = conversation_text[-self.SUMMARY_INPUT_MAX_CHARS:]
         
         # Use the agent to summarize
         prompt = f"""
@@ -103,24 +218,40 @@ class MemoryManager:
             # Simple simulation of agent call if not passed
             # In real impl, we should use the agent's internal LLM
             if hasattr(agent_instance, 'client'):
-                response = agent_instance.client.chat.completions.create(
-                    model=agent_instance.model_type,
-                    messages=[{"role": "user", "content": prompt}]
+                response = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        agent_instance.client.chat.completions.create,
+                        model=agent_instance.model_type,
+                        messages=[{"role": "user", "content": prompt}],
+                        max_tokens=self.SUMMARY_MAX_TOKENS
+                    ),
+                    timeout=self.SUMMARY_TIMEOUT
                 )
                 summary = response.choices[0].message.content
             else:
                 summary = "无法生成摘要 (Agent未初始化)"
                 
-            # Store summary in Vector DB
+            # Store summary in Vector DB (写入缓冲后立即落库；embedding 计算较慢，放到线程中执行)
             self.add_memory(
                 user_id=user_id,
                 content=summary,
                 role="system",
                 metadata={"type": "summary", "original_msg_count": len(history_messages)}
             )
+            await asyncio.to_thread(self.flush)
             logger.info(f"Compressed memory for {user_id}")
             return summary
             
         except Exception as e:
             logger.error(f"Failed to compress memory: {e}")
             return None
+
+
+@lru_cache(maxsize=8)
+def get_memory_manager(persist_path: str = "./data/chroma_db") -> MemoryManager:
+    """
+    获取共享的 MemoryManager
+
+    同一目录的调用方共用写缓冲和检索缓存，一方写入后另一方的缓存也会失效。
+    """
+    return MemoryManager(persist_path=persist_path)
@@ -3,16 +3,91 @@
 用于保护需要消耗额度的 API 端点
 """
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 from loguru import logger
 
+from app.core import quota_redis, usage_writer
 from app.core.database import get_db
 from app.core.auth import get_current_user
-from app.models.user_models import User
+from app.models.user_models import User, UserQuota, UserRole
 from app.services.quota_service import QuotaService
 
 
+# 不限额的角色
+_UNLIMITED_ROLES = frozenset({UserRole.ADMIN, UserRole.MEMBER})
+
+
+def load_request_quota(request: Request, db: Session, user: User) -> UserQuota:
+    """
+    读取本次请求的额度对象
+
+    同一请求内只检查/重置一次，结果保存在 request.state 上，
+    后续的额度检查、扣除和响应构建直接复用。
+    """
+    quota = getattr(request.state, "quota", None)
+    if quota is None:
+        quota = QuotaService.check_and_reset_daily_quota(db, user)
+        request.state.quota = quota
+    return quota
+
+
+def get_cached_quota(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> UserQuota:
+    """额度对象的依赖注入（请求级缓存）"""
+    return load_request_quota(request, db, current_user)
+
+
+def _quota_exceeded(daily_quota: int, daily_used: int, remaining_quota: int) -> HTTPException:
+    """额度不足时返回的 429 错误"""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail={
+            "error": "quota_exceeded",
+            "message": "今日额度已用完，请明天再试或升级为会员",
+            "daily_quota": daily_quota,
+            "daily_used": daily_used,
+            "remaining_quota": remaining_quota
+        }
+    )
+
+
+async def _consume_with_redis(
+    request: Request, db: Session, user: User, cost: int, action_type: str, details: str
+):
+    """
+    通过 Redis 原子计数检查并扣除额度
+
+    额度上限缓存在 Redis 中，缓存缺失时才查询数据库；使用记录和 daily_used 由 usage_writer 批量写库。
+    """
+    # 管理员和会员无限额度，只记录使用
+    if user.role in _UNLIMITED_ROLES:
+        usage_writer.enqueue_usage(user.id, action_type, 0, details)
+        return
+
+    daily_quota = await quota_redis.get_cached_limit(user.id)
+    if daily_quota is None:
+        quota = load_request_quota(request, db, user)
+        daily_quota = quota.daily_quota
+        await quota_redis.prime_quota(user.id, daily_quota, quota.daily_used)
+
+    # -1 表示无限额度
+    if daily_quota == -1:
+        usage_writer.enqueue_usage(user.id, action_type, 0, details)
+        return
+
+    ok, used, remaining = await quota_redis.try_consume(user.id, cost, daily_quota)
+    if not ok:
+        logger.warning("User {} has insufficient quota for {}", user.id, action_type)
+        raise _quota_exceeded(daily_quota, used, remaining)
+
+    usage_writer.enqueue_usage(user.id, action_type, cost, details, apply_to_quota=True)
+
+
 def require_quota(cost: int = 1, action_type: str = "default"):
     """
     额度检查依赖注入工厂函数
@@ -33,12 +108,16 @@ def require_quota(cost: int = 1, action_type: str = "default"):
         ):
             ...
     """
-    async def check_quota_dependency(
+    # 使用记录的说明文字在创建依赖时生成一次，不必每个请求重新格式化
+    details = f"API call: {action_type}"
+
+    async def check_quota_with_redis(
+        request: Request,
         current_user: User = Depends(get_current_user),
         db: Session = Depends(get_db)
     ) -> User:
         """
-        检查用户是否有足够额度
+        检查并扣除额度（Redis 原子计数，不访问数据库）
 
         Returns:
             用户对象
@@ -46,40 +125,67 @@ def require_quota(cost: int = 1, action_type: str = "default"):
         Raises:
             HTTPException: 额度不足
         """
-        # 检查额度
-        if not QuotaService.has_quota(db, current_user, cost):
-            logger.warning(f"User {current_user.id} has insufficient quota for {action_type}")
+        await _consume_with_redis(request, db, current_user, cost, action_type, details)
+        return current_user
 
-            # 获取额度信息
-            quota_info = QuotaService.get_user_quota_info(db, current_user)
+    async def check_quota_dependency(
+        request: Request,
+        current_user: User = Depends(get_current_user),
+        db: Session = Depends(get_db)
+    ) -> User:
+        """
+        检查用户是否有足够额度
 
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail={
-                    "error": "quota_exceeded",
-                    "message": "今日额度已用完，请明天再试或升级为会员",
-                    "daily_quota": quota_info["daily_quota"],
-                    "daily_used": quota_info["daily_used"],
-                    "remaining_quota": quota_info["remaining_quota"]
-                }
-            )
+        Returns:
+            用户对象
 
-        # 消耗额度
+        Raises:
+            HTTPException: 额度不足
+        """
+        # 管理员和会员无限额度，无需加载额度记录
+        quota = None
+        if current_user.role not in _UNLIMITED_ROLES:
+            quota = load_request_quota(request, db, current_user)
+
+            if quota.daily_quota != -1:
+                # 检查到扣除之间锁定额度行，防止并发请求重复扣除
+                try:
+                    QuotaService.lock_quota(db, quota)
+                except OperationalError:
+                    db.rollback()
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="额度正在被其他请求更新，请稍后重试"
+                    )
+
+                # 检查额度（-1 表示无限额度）
+                if quota.daily_used + cost > quota.daily_quota:
+                    logger.warning("User {} has insufficient quota for {}", current_user.id, action_type)
+                    exc = _quota_exceeded(quota.daily_quota, quota.daily_used, quota.remaining_quota)
+                    db.rollback()  # 释放行锁
+                    raise exc
+
+        # 消耗额度（使用记录交给 usage_writer 批量写入）
         if not QuotaService.consume_quota(
             db=db,
             user=current_user,
             action_type=action_type,
             cost=cost,
-            details=f"API call: {action_type}"
+            details=details,
+            quota=quota,
+            record_usage=False
         ):
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="扣除额度失败，请稍后重试"
             )
+        recorded_cost = cost if quota is not None and quota.daily_quota != -1 else 0
+        usage_writer.enqueue_usage(current_user.id, action_type, recorded_cost, details)
 
         return current_user
 
-    return check_quota_dependency
+    # 是否使用 Redis 在启动时已确定，创建依赖时直接选定实现，请求时不再判断
+    return check_quota_with_redis if quota_redis.enabled else check_quota_dependency
 
 
 def consume_quota_after(action_type: str = "default", cost: int = 1):
@@ -99,6 +205,8 @@ def consume_quota_after(action_type: str = "default", cost: int = 1):
             # 成功后扣除额度
             consume_quota_after("chat", 1)
     """
+    details = f"API call: {action_type}"
+
     def quota_consumer(
         current_user: User = Depends(get_current_user),
         db: Session = Depends(get_db)
@@ -110,7 +218,7 @@ def consume_quota_after(action_type: str = "default", cost: int = 1):
                 user=current_user,
                 action_type=action_type,
                 cost=cost,
-                details=f"API call: {action_type}"
+                details=details
             )
         return consume
 
@@ -0,0 +1,100 @@
+"""
+基于 Redis 的额度计数
+设置 REDIS_URL 时，每日额度的检查与扣除合并为一次原子的 Lua 脚本调用，
+使用记录和 daily_used 的数据库写入交给 usage_writer 批量完成；未配置 Redis 时不启用，
+require_quota 继续使用 QuotaService 的数据库实现。
+"""
+
+import os
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Optional, Tuple
+
+from loguru import logger
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+# 额度足够时原子地扣除：返回 {是否成功, 扣除后（或当前）已用额度}
+_CONSUME_SCRIPT = """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+local cost = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+if used + cost > limit then
+    return {0, used}
+end
+used = redis.call('INCRBY', KEYS[1], cost)
+redis.call('EXPIREAT', KEYS[1], ARGV[3])
+return {1, used}
+"""
+
+_redis = None
+_consume = None
+
+_redis_url = os.getenv("REDIS_URL")
+if _redis_url:
+    if REDIS_AVAILABLE:
+        _redis = aioredis.from_url(_redis_url)
+        _consume = _redis.register_script(_CONSUME_SCRIPT)
+        logger.info("额度计数使用 Redis")
+    else:
+        logger.warning("已设置 REDIS_URL 但未安装 redis，额度计数使用数据库")
+
+enabled = _redis is not None
+
+
+def _today_keys(user_id: int) -> Tuple[str, str]:
+    """当日已用额度与额度上限的 key"""
+    day = date.today().strftime("%Y%m%d")
+    return f"quota:{user_id}:{day}", f"quota_limit:{user_id}:{day}"
+
+
+def _end_of_day() -> int:
+    """今天结束时的 Unix 时间戳（当日 key 在此时过期）"""
+    tomorrow = datetime.combine(date.today() + timedelta(days=1), dt_time.min)
+    return int(tomorrow.timestamp())
+
+
+async def prime_quota(user_id: int, daily_quota: int, daily_used: int):
+    """
+    将数据库中的当日额度写入 Redis（登录时或缓存缺失时调用）
+
+    已用额度只在 Redis 中不存在时写入，不会覆盖 Redis 里更新的计数。
+    """
+    used_key, limit_key = _today_keys(user_id)
+    expire_at = _end_of_day()
+    async with _redis.pipeline(transaction=True) as pipe:
+        pipe.set(limit_key, daily_quota, exat=expire_at)
+        pipe.set(used_key, daily_used, exat=expire_at, nx=True)
+        await pipe.execute()
+
+
+async def get_cached_limit(user_id: int) -> Optional[int]:
+    """读取缓存的当日额度上限，未缓存时返回 None"""
+    _, limit_key = _today_keys(user_id)
+    value = await _redis.get(limit_key)
+    return int(value) if value is not None else None
+
+
+async def invalidate_limit(user_id: int):
+    """额度上限变更后清除缓存（下次请求从数据库重新加载）"""
+    if not enabled:
+        return
+    _, limit_key = _today_keys(user_id)
+    await _redis.delete(limit_key)
+
+
+async def try_consume(user_id: int, cost: int, daily_quota: int) -> Tuple[bool, int, int]:
+    """
+    原子地检查并扣除额度
+
+    Returns:
+        (是否成功, 已用额度, 剩余额度)
+    """
+    used_key, _ = _today_keys(user_id)
+    ok, used = await _consume(keys=[used_key], args=[cost, daily_quota, _end_of_day()])
+    used = int(used)
+    return bool(ok), used, max(0, daily_quota - used)
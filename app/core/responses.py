@@ -0,0 +1,24 @@
+"""
+JSON 响应类
+基于 orjson 的默认响应类，统一 datetime 序列化格式
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+class UTCORJSONResponse(ORJSONResponse):
+    """orjson 响应：naive datetime 视为 UTC，并以 Z 结尾输出"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            option=(
+                orjson.OPT_NON_STR_KEYS
+                | orjson.OPT_SERIALIZE_NUMPY
+                | orjson.OPT_NAIVE_UTC
+                | orjson.OPT_UTC_Z
+            ),
+        )
@@ -1,61 +1,160 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
+from collections import deque
 from datetime import datetime
-import json
+import atexit
+import orjson
 import os
 from loguru import logger
 
+# 日志累计多少条变更后合并进快照
+COMPACT_EVERY = 200
+# 状态文件读写缓冲区大小
+IO_BUFFER_SIZE = 64 * 1024
+# 情绪历史保留的最大条数
+EMOTION_HISTORY_MAX = 50
+
 class StateManager:
-    """会话状态管理器"""
+    """
+    会话状态管理器
+
+    状态由快照文件和追加日志两部分组成：每次变更只向日志追加一行，
+    累计 COMPACT_EVERY 条或进程退出时把状态整体写入快照并清空日志。
+    快照记录已合并的最大序号 seq，重放日志时跳过不大于它的记录。
+    """
     
     def __init__(self, state_file: str = "session_state.json"):
         self.state_file = state_file
+        self.log_file = f"{state_file}.log"
         self.state: Dict[str, Any] = self._load_state()
+        self._last_written: Optional[bytes] = None
+        self._pending, torn = self._replay_log()
+        self._log = open(self.log_file, 'ab', buffering=0)
+        if torn:
+            # 先合并并清空日志，避免新记录接在残行后面
+            self.flush()
+        # 进程退出时把日志合并进快照
+        atexit.register(self.flush)
         
     def _load_state(self) -> Dict[str, Any]:
-        """加载状态"""
+        """加载状态快照"""
         if os.path.exists(self.state_file):
             try:
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                with open(self.state_file, 'rb', buffering=IO_BUFFER_SIZE) as f:
+                    state = orjson.loads(f.read())
+                state["emotion_history"] = deque(state.get("emotion_history", []), maxlen=EMOTION_HISTORY_MAX)
+                state.setdefault("seq", 0)
+                return state
             except Exception as e:
                 logger.error(f"加载状态失败: {e}")
         return self._get_default_state()
+
+    def _replay_log(self) -> Tuple[int, bool]:
+        """
+        将日志中快照之后的变更应用到状态上
+
+        Returns:
+            (重放的变更条数, 日志末尾是否有不完整的记录)
+        """
+        if not os.path.exists(self.log_file):
+            return 0, False
+        replayed = 0
+        with open(self.log_file, 'rb', buffering=IO_BUFFER_SIZE) as f:
+            for line in f:
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # 写到一半时崩溃留下的残行，丢弃
+                    logger.warning("状态日志末尾存在不完整的记录，已忽略")
+                    return max(replayed, 1), True
+                if entry["seq"] <= self.state["seq"]:
+                    continue
+                self._apply(entry)
+                replayed += 1
+        return replayed, False
+
+    def _apply(self, entry: Dict[str, Any]):
+        """把一条变更应用到内存中的状态"""
+        if entry["op"] == "risk":
+            self.state["risk_level"] = entry["v"]
+        elif entry["op"] == "emotion":
+            # deque 达到上限后自动淘汰最早的记录
+            self.state["emotion_history"].append({
+                "timestamp": entry["t"],
+                "emotion": entry["e"],
+                "score": entry["s"]
+            })
+        self.state["seq"] = entry["seq"]
+
+    def _record(self, entry: Dict[str, Any]):
+        """应用变更并追加到日志，累计足够多时合并进快照"""
+        entry["seq"] = self.state["seq"] + 1
+        self._apply(entry)
+        try:
+            self._log.write(orjson.dumps(entry) + b"\n")
+        except Exception as e:
+            logger.error(f"写入状态日志失败: {e}")
+        self._pending += 1
+        if self._pending >= COMPACT_EVERY:
+            self.flush()
         
     def _get_default_state(self) -> Dict[str, Any]:
         """默认状态"""
         return {
             "session_id": datetime.now().strftime("%Y%m%d%H%M%S"),
             "risk_level": "LOW",
-            "emotion_history": [],
+            "emotion_history": deque(maxlen=EMOTION_HISTORY_MAX),
             "interventions": [],
             "last_interaction": None,
-            "metadata": {}
+            "metadata": {},
+            "seq": 0
         }
         
-    def save_state(self):
-        """保存状态"""
+    def save_state(self) -> bool:
+        """
+        保存状态快照（紧凑 JSON，先写临时文件再原子替换，避免中途失败留下半个文件）
+
+        Returns:
+            快照是否已是最新
+        """
+        data = orjson.dumps(self.state, default=list, option=orjson.OPT_NON_STR_KEYS)
+        if data == self._last_written:
+            # 内容与上次写入相同，跳过
+            return True
+        tmp_file = f"{self.state_file}.tmp"
         try:
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(self.state, f, ensure_ascii=False, indent=2)
+            with open(tmp_file, 'wb', buffering=IO_BUFFER_SIZE) as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.state_file)
+            self._last_written = data
+            return True
         except Exception as e:
             logger.error(f"保存状态失败: {e}")
+            return False
+
+    def flush(self):
+        """把日志中的变更合并进快照，并清空日志"""
+        if self._pending == 0:
+            return
+        if not self.save_state():
+            # 快照写入失败，保留日志
+            return
+        self._log.truncate(0)
+        self._pending = 0
             
     def update_risk_level(self, level: str):
         """更新风险等级"""
-        self.state["risk_level"] = level
-        self.save_state()
+        self._record({"op": "risk", "v": level})
         
     def add_emotion_record(self, emotion: str, score: float):
         """添加情绪记录"""
-        self.state["emotion_history"].append({
-            "timestamp": datetime.now().isoformat(),
-            "emotion": emotion,
-            "score": score
+        self._record({
+            "op": "emotion",
+            "t": datetime.now().isoformat(),
+            "e": emotion,
+            "s": score
         })
-        # 保持历史记录长度在合理范围
-        if len(self.state["emotion_history"]) > 50:
-            self.state["emotion_history"] = self.state["emotion_history"][-50:]
-        self.save_state()
         
     def get_context(self) -> Dict[str, Any]:
         """获取当前上下文"""
@@ -0,0 +1,139 @@
+"""
+使用记录批量写入
+额度扣除后不再逐条同步 INSERT 使用记录，而是放入进程内队列，
+由后台任务每 FLUSH_INTERVAL 秒（或攒满 QUEUE_BATCH 条）批量写库。
+"""
+
+import asyncio
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import case, update
+
+from app.core.database import SessionLocal
+from app.models.user_models import UsageRecord, UserQuota
+
+
+# 批量写库的间隔（秒）和单批最大条数
+FLUSH_INTERVAL = 0.1
+QUEUE_BATCH = 100
+
+# 队列元素：(使用记录, 是否同时累加到 daily_used)，或停止信号 _STOP
+_queue: Optional[asyncio.Queue] = None
+_STOP = object()
+_writer_task: Optional[asyncio.Task] = None
+
+
+def enqueue_usage(
+    user_id: int,
+    action_type: str,
+    cost: int,
+    details: Optional[str] = None,
+    apply_to_quota: bool = False
+):
+    """
+    登记一条使用记录（需在事件循环中调用）
+
+    Args:
+        apply_to_quota: 写入时是否把 cost 累加到 user_quotas.daily_used
+            （额度已在数据库中扣除时为 False，由 Redis 计数时为 True）
+    """
+    global _queue, _writer_task
+    if _queue is None:
+        _queue = asyncio.Queue()
+    if _writer_task is None or _writer_task.done():
+        _writer_task = asyncio.create_task(_writer_loop())
+
+    _queue.put_nowait(({
+        "user_id": user_id,
+        "action_type": action_type,
+        "resource_cost": cost,
+        "details": details,
+        "created_at": datetime.utcnow(),
+    }, apply_to_quota))
+
+
+def _write_batch(batch: List[Tuple[Dict, bool]]):
+    """批量插入使用记录，并按用户汇总更新 daily_used（同步，在线程中执行）"""
+    today = date.today()
+    costs: Dict[int, int] = {}
+    for row, apply_to_quota in batch:
+        if apply_to_quota and row["resource_cost"]:
+            costs[row["user_id"]] = costs.get(row["user_id"], 0) + row["resource_cost"]
+
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(UsageRecord, [row for row, _ in batch])
+        for user_id, cost in costs.items():
+            db.execute(
+                update(UserQuota)
+                .where(UserQuota.user_id == user_id)
+                .values(
+                    # 日期已过期的记录先归零再累加（与 check_and_reset_daily_quota 一致）
+                    daily_used=case(
+                        (UserQuota.quota_date < today, cost),
+                        else_=UserQuota.daily_used + cost
+                    ),
+                    quota_date=today
+                )
+            )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"批量写入使用记录失败（{len(batch)} 条）: {e}")
+    finally:
+        db.close()
+
+
+def _drain(batch: List[Tuple[Dict, bool]]) -> bool:
+    """
+    取出队列中已有的记录（不超过单批上限）
+
+    Returns:
+        是否取到了停止信号
+    """
+    while len(batch) < QUEUE_BATCH and not _queue.empty():
+        item = _queue.get_nowait()
+        if item is _STOP:
+            return True
+        batch.append(item)
+    return False
+
+
+async def _writer_loop():
+    """后台任务：攒满一批或等待 FLUSH_INTERVAL 秒后写库；收到停止信号时写完当前批次再退出"""
+    while True:
+        item = await _queue.get()
+        if item is _STOP:
+            return
+        batch = [item]
+        stop = _drain(batch)
+        if not stop and len(batch) < QUEUE_BATCH:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            stop = _drain(batch)
+        await asyncio.to_thread(_write_batch, batch)
+        if stop:
+            return
+
+
+async def flush():
+    """
+    立即写入队列中剩余的使用记录（关闭服务时调用）
+
+    不取消后台任务（取消会丢掉它已取出、尚未写库的批次），而是发送停止信号并等待其写完，
+    再写入停止信号之后入队的记录。
+    """
+    if _queue is None:
+        return
+    if _writer_task is not None and not _writer_task.done():
+        _queue.put_nowait(_STOP)
+        try:
+            await _writer_task
+        except Exception as e:
+            logger.error(f"使用记录写入任务异常退出: {e}")
+    while not _queue.empty():
+        batch: List[Tuple[Dict, bool]] = []
+        _drain(batch)
+        if batch:
+            await asyncio.to_thread(_write_batch, batch)
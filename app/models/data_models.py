@@ -1,16 +1,18 @@
 from dataclasses import dataclass, field
-from typing import List, Optional, Dict, Any
+from pathlib import Path
+from typing import List, Optional, Dict, Any, Tuple
 from .types import RiskLevel, EmotionType, SkillModule
 
-@dataclass
+@dataclass(slots=True)
 class UserInput:
     user_id: str
     text: Optional[str] = None
-    audio_data: Optional[bytes] = None  # Placeholder for audio
-    image_data: Optional[bytes] = None  # Placeholder for image
-    context_history: List[Dict[str, Any]] = field(default_factory=list)
+    audio_data: Optional[Path] = None  # Uploaded audio, spooled to a temp file
+    image_data: Optional[Path] = None  # Uploaded image, spooled to a temp file
+    context_history: Tuple[Dict[str, Any], ...] = ()
+    metadata: Dict[str, Any] = field(default_factory=dict)  # e.g. uploaded file info
 
-@dataclass
+@dataclass(slots=True)
 class EmotionOutput:
     primary_emotions: List[EmotionType]
     arousal: float  # 0.0 to 1.0
@@ -19,7 +21,7 @@ class EmotionOutput:
     situation_summary: str
     routing_suggestion: str
 
-@dataclass
+@dataclass(slots=True)
 class DBTRecommendation:
     modules: List[SkillModule]
     specific_skills: List[str]
@@ -27,7 +29,7 @@ class DBTRecommendation:
     guidance_strategy: str
     execution_template: Dict[str, Any]
 
-@dataclass
+@dataclass(slots=True)
 class AgentState:
     user_id: str
     short_term_mood: Dict[str, Any]
@@ -1,9 +1,18 @@
-from enum import Enum
+from enum import Enum, IntEnum
 
-class RiskLevel(Enum):
-    L1 = "L1"  # Daily emotion state, no significant risk
-    L2 = "L2"  # Emotional distress, negative emotions or dysregulation
-    L3 = "L3"  # Crisis state, self-harm or severe psychological risk
+class RiskLevel(IntEnum):
+    L1 = 1  # Daily emotion state, no significant risk
+    L2 = 2  # Emotional distress, negative emotions or dysregulation
+    L3 = 3  # Crisis state, self-harm or severe psychological risk
+
+    @property
+    def label(self) -> str:
+        """String form used in API payloads ("L1"/"L2"/"L3")"""
+        return self.name
+
+    @classmethod
+    def from_label(cls, label: str) -> "RiskLevel":
+        return cls[label]
 
 class EmotionType(Enum):
     ANXIETY = "Anxiety"
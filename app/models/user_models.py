@@ -1,18 +1,21 @@
 """
 用户和权限相关数据库模型
-包含：User（用户）、Role（角色）、UserQuota（用户额度）、UsageRecord（使用记录）
+包含：User（用户）、Role（角色）、UserQuota（用户额度）、UsageRecord（使用记录）、
+ProfileRecord（情绪画像索引）
 """
 
 from datetime import datetime, date
-from typing import Optional, List
+from functools import lru_cache
+from typing import Optional, List, Tuple
 from enum import Enum
 
 from sqlalchemy import (
-    Column, Integer, String, Boolean, DateTime, Date,
-    ForeignKey, Numeric, Enum as SQLEnum, Index
+    Column, Integer, String, Boolean, DateTime, Date, Float, Text,
+    ForeignKey, Numeric, Enum as SQLEnum, Index, DDL, event
 )
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship, DeclarativeBase
-from passlib.context import CryptContext
+from sqlalchemy.sql.expression import FunctionElement
 
 
 class Base(DeclarativeBase):
@@ -20,6 +23,34 @@ class Base(DeclarativeBase):
     pass
 
 
+class utcnow(FunctionElement):
+    """
+    数据库端的当前 UTC 时间（用作 server_default / onupdate）
+
+    各数据库统一返回不带时区的 UTC 时间，与 datetime.utcnow 一致。
+    ORM 插入时仍由 Python 端 default 赋值：create_all 不会修改已有表，
+    旧库（尤其是无法修改列默认值的 SQLite）中的列没有数据库默认值。
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _compile_utcnow(element, compiler, **kw):
+    # SQLite 的 CURRENT_TIMESTAMP 本身就是 UTC
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "postgresql")
+def _compile_utcnow_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utcnow, "mysql")
+def _compile_utcnow_mysql(element, compiler, **kw):
+    return "UTC_TIMESTAMP()"
+
+
 class UserRole(str, Enum):
     """用户角色枚举"""
     ADMIN = "admin"      # 管理员：不限额，可管理用户
@@ -30,6 +61,23 @@ class UserRole(str, Enum):
 class User(Base):
     """用户表"""
     __tablename__ = "users"
+    __table_args__ = (
+        # 管理员用户列表按状态/角色筛选
+        Index("ix_users_active_role", "is_active", "role"),
+        # 邮箱/用户名模糊搜索（ILIKE '%...%'），仅 PostgreSQL 使用 pg_trgm
+        Index(
+            "ix_users_email_trgm", "email",
+            postgresql_using="gin",
+            postgresql_ops={"email": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_users_username_trgm", "username",
+            postgresql_using="gin",
+            postgresql_ops={"username": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+    # 数据库生成的时间戳在 INSERT/UPDATE 时一并取回（支持 RETURNING 时不额外查询）
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     email = Column(String(255), unique=True, nullable=False, index=True)
@@ -45,8 +93,8 @@ class User(Base):
     personality = Column(String(500), nullable=True)  # JSON or text description
     emotional_profile = Column(String(1000), nullable=True)  # JSON or text description
 
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=utcnow(), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, server_default=utcnow(), onupdate=utcnow())
     last_login = Column(DateTime, nullable=True)
 
     # 关联额度
@@ -60,9 +108,22 @@ class User(Base):
         return f"<User(id={self.id}, email='{self.email}', role='{self.role}')>"
 
 
+# trigram 索引依赖 pg_trgm 扩展
+event.listen(
+    User.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
 class UserQuota(Base):
     """用户额度表"""
     __tablename__ = "user_quotas"
+    __table_args__ = (
+        # 每日重置按 quota_date < today 批量更新
+        Index("ix_user_quotas_quota_date", "quota_date"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), unique=True, nullable=False)
@@ -74,8 +135,8 @@ class UserQuota(Base):
     # 额度重置日期
     quota_date = Column(Date, default=date.today, nullable=False)
 
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=utcnow(), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, server_default=utcnow(), onupdate=utcnow())
 
     # 关联用户
     user = relationship("User", back_populates="quota")
@@ -99,6 +160,10 @@ class UserQuota(Base):
 class UsageRecord(Base):
     """使用记录表"""
     __tablename__ = "usage_records"
+    __table_args__ = (
+        # 按用户倒序查询使用记录
+        Index("ix_usage_records_user_created", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -111,7 +176,7 @@ class UsageRecord(Base):
     details = Column(String(1000), nullable=True)  # 存储额外的详细信息
 
     # 时间戳
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=utcnow(), nullable=False)
 
     # 关联用户
     user = relationship("User", back_populates="usage_records")
@@ -123,6 +188,10 @@ class UsageRecord(Base):
 class ChatMessage(Base):
     """聊天记录表"""
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # 历史记录按用户做 (created_at, id) 游标分页
+        Index("ix_chat_messages_user_created_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -138,15 +207,97 @@ class ChatMessage(Base):
         return f"<ChatMessage(id={self.id}, user_id={self.user_id}, role='{self.role}')>"
 
 
-# 密码加密上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+class ProfileRecord(Base):
+    """
+    情绪画像表
+
+    画像管理器保存画像时同步写入：常用统计字段单独成列以便排序和聚合，
+    完整画像以 JSON 存在 data 列中。
+    """
+    __tablename__ = "profiles"
+    __table_args__ = (
+        Index("ix_profiles_updated_at", "updated_at", "user_id"),
+    )
+
+    user_id = Column(String(100), primary_key=True)
+    created_at = Column(String(40), nullable=True)  # ISO 格式字符串，与画像文件一致
+    updated_at = Column(String(40), nullable=True)
+
+    total_interactions = Column(Integer, default=0, nullable=False)
+    crisis_count = Column(Integer, default=0, nullable=False)
+    intervention_count = Column(Integer, default=0, nullable=False)
+    data_quality_score = Column(Float, default=0.0, nullable=False)
+
+    data = Column(Text, nullable=False)  # 完整画像 JSON
+
+    def __repr__(self):
+        return f"<ProfileRecord(user_id='{self.user_id}', updated_at='{self.updated_at}')>"
+
+
+# 密码哈希：新密码使用 argon2id（argon2-cffi 默认参数，即 RFC 9106 低内存配置：
+# t=3、m=64MiB、p=4，单次验证约数十毫秒），旧 bcrypt 哈希仍可验证并在登录时升级。
+# 直接调用 argon2-cffi / bcrypt，不经过 passlib 的方案查找和参数处理。
+# 两个库在首次验证/生成密码时才导入，不处理登录的进程不承担导入开销。
+@lru_cache(maxsize=1)
+def _password_hasher():
+    """argon2id 哈希器（首次调用时创建）"""
+    from argon2 import PasswordHasher
+    return PasswordHasher()
+
+# bcrypt 只使用密码的前 72 字节（bcrypt>=5 对超长密码直接报错，这里与旧版一样截断）
+BCRYPT_MAX_PASSWORD_BYTES = 72
+_BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
+
+def _verify_argon2(plain_password: str, hashed_password: str) -> bool:
+    """验证 argon2 哈希"""
+    from argon2.exceptions import InvalidHashError, VerificationError
+    try:
+        return _password_hasher().verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def _verify_bcrypt(plain_password: str, hashed_password: str) -> bool:
+    """验证旧的 bcrypt 哈希"""
+    import bcrypt
+    try:
+        return bcrypt.checkpw(
+            plain_password.encode()[:BCRYPT_MAX_PASSWORD_BYTES], hashed_password.encode()
+        )
+    except ValueError:
+        return False
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
-    return pwd_context.verify(plain_password, hashed_password)
+    if hashed_password.startswith("$argon2"):
+        return _verify_argon2(plain_password, hashed_password)
+    if hashed_password.startswith(_BCRYPT_PREFIXES):
+        return _verify_bcrypt(plain_password, hashed_password)
+    return False
 
 
 def get_password_hash(password: str) -> str:
     """生成密码哈希"""
-    return pwd_context.hash(password)
+    return _password_hasher().hash(password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    验证密码，并在哈希需要升级（如旧的 bcrypt 哈希）时一并生成新哈希
+
+    Returns:
+        (是否验证通过, 新哈希；无需升级时为 None)
+    """
+    if hashed_password.startswith("$argon2"):
+        if not _verify_argon2(plain_password, hashed_password):
+            return False, None
+        if _password_hasher().check_needs_rehash(hashed_password):
+            return True, get_password_hash(plain_password)
+        return True, None
+
+    if hashed_password.startswith(_BCRYPT_PREFIXES) and _verify_bcrypt(plain_password, hashed_password):
+        return True, get_password_hash(plain_password)
+
+    return False, None
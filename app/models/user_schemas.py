@@ -3,12 +3,16 @@
 用于 API 请求和响应的数据验证
 """
 
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, TypeAdapter
+from typing import Any, Optional
 from datetime import datetime, date
 from app.models.user_models import UserRole
 
 
+# 响应模型：可从 ORM 对象构建，忽略多余字段，构建后不可修改
+RESPONSE_MODEL_CONFIG = ConfigDict(from_attributes=True, extra="ignore", frozen=True)
+
+
 # ============== 用户相关 Schema ==============
 
 class UserBase(BaseModel):
@@ -40,8 +44,7 @@ class UserResponse(UserBase):
     created_at: datetime
     last_login: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = RESPONSE_MODEL_CONFIG
 
 
 class OnboardingRequest(BaseModel):
@@ -66,16 +69,45 @@ class UserQuotaResponse(BaseModel):
     remaining_quota: int
     quota_date: date
 
-    class Config:
-        from_attributes = True
+    model_config = RESPONSE_MODEL_CONFIG
 
 
 class UserDetailResponse(UserResponse):
     """用户详细信息响应（包含额度）"""
     quota: Optional[UserQuotaResponse] = None
 
-    class Config:
-        from_attributes = True
+    model_config = RESPONSE_MODEL_CONFIG
+
+
+# 用户列表整体转换（由 pydantic-core 一次处理整个列表，而不是逐个模型处理）
+user_detail_list_adapter = TypeAdapter(list[UserDetailResponse])
+
+
+def build_user_response(user: Any) -> UserResponse:
+    """
+    从数据库中的 User 构建响应（跳过校验）
+
+    数据来自数据库，已满足字段约束，使用 model_construct 避免重复校验；
+    按 model_fields 取值，新增字段时不会遗漏。
+    """
+    return UserResponse.model_construct(
+        **{name: getattr(user, name) for name in UserResponse.model_fields}
+    )
+
+
+def build_user_detail_response(user: Any, quota: Any = None) -> UserDetailResponse:
+    """从数据库中的 User 和 UserQuota 构建详细响应（跳过校验）"""
+    return UserDetailResponse.model_construct(
+        **{name: getattr(user, name) for name in UserResponse.model_fields},
+        quota=build_quota_response(quota) if quota is not None else None
+    )
+
+
+def build_quota_response(quota: Any) -> UserQuotaResponse:
+    """从数据库中的 UserQuota 构建响应（跳过校验）"""
+    return UserQuotaResponse.model_construct(
+        **{name: getattr(quota, name) for name in UserQuotaResponse.model_fields}
+    )
 
 
 # ============== 管理员操作 Schema ==============
@@ -109,8 +141,7 @@ class UsageRecordResponse(BaseModel):
     details: Optional[str] = None
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = RESPONSE_MODEL_CONFIG
 
 
 # ============== 列表查询 Schema ==============
@@ -0,0 +1,32 @@
+"""
+异常处理
+DBT 路由中未捕获的异常在此统一记录日志并转换为 500 响应，处理函数只需抛出业务相关的 HTTPException。
+作为路由类挂在 DBT 的 APIRouter 上，只作用于 DBT 路由，不影响所在应用的其它接口。
+"""
+
+from typing import Callable
+
+from fastapi import Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute
+from loguru import logger
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+
+class DBTRoute(APIRoute):
+    """未捕获的异常记录堆栈后返回 {"detail": "服务错误: ..."}，HTTPException 与参数校验错误照常处理"""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            try:
+                return await handler(request)
+            except (StarletteHTTPException, RequestValidationError):
+                raise
+            except Exception as exc:
+                logger.opt(exception=exc).error("请求处理失败 {} {}: {}", request.method, request.url.path, exc)
+                return ORJSONResponse(status_code=500, content={"detail": f"服务错误: {exc}"})
+
+        return route_handler
@@ -6,9 +6,12 @@ API路由定义
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
+from .. import cache
+from .errors import DBTRoute
 from ..db.session import get_db
 from ..models.schemas import (
     RecommendRequest, DBTRecommendation,
@@ -18,7 +21,9 @@ from ..repositories.skill_repository import SkillRepository
 from ..services.recommendation_engine import RecommendationEngine
 
 
-router = APIRouter()
+# DBT 模块也可独立运行（main.py），路由自身默认使用 orjson 序列化；
+# 未捕获的异常由 DBTRoute 统一转换为 500 响应
+router = APIRouter(default_response_class=ORJSONResponse, route_class=DBTRoute)
 
 
 # ==================== 依赖注入 ====================
@@ -56,15 +61,11 @@ async def get_recommendation(
     - **agent_context**: Agent上下文（可选）
     - **context**: 情境描述（可选）
     """
-    try:
-        logger.info(f"收到推荐请求: risk_level={request.intervention_assessment.risk_level}")
-        recommendation = await engine.recommend(request)
-        logger.info(f"推荐完成: module={recommendation.recommended_module}, "
-                   f"skills={[s.skill_name for s in recommendation.recommended_skills]}")
-        return recommendation
-    except Exception as e:
-        logger.error(f"推荐失败: {e}")
-        raise HTTPException(status_code=500, detail=f"推荐服务错误: {str(e)}")
+    logger.info(f"收到推荐请求: risk_level={request.intervention_assessment.risk_level}")
+    recommendation = await engine.recommend(request)
+    logger.info(f"推荐完成: module={recommendation.recommended_module}, "
+               f"skills={[s.skill_name for s in recommendation.recommended_skills]}")
+    return recommendation
 
 
 # ==================== 技能API ====================
@@ -75,28 +76,25 @@ async def get_recommendation(
     summary="获取所有技能列表",
     description="获取所有可用的DBT技能"
 )
+@cache.cached(cache.SKILLS_KEY, ttl=cache.LIST_TTL)
 async def get_all_skills(
     active_only: bool = True,
     repository: SkillRepository = Depends(get_repository)
 ) -> List[SkillInfo]:
     """获取所有技能列表"""
-    try:
-        skills = await repository.get_all_skills(active_only=active_only)
-        return [
-            SkillInfo(
-                id=s.id,
-                name=s.name,
-                name_en=s.name_en,
-                module_name=s.module.name if s.module else "",
-                description=s.description or "",
-                difficulty_level=s.difficulty_level or 1,
-                is_active=s.is_active
-            )
-            for s in skills
-        ]
-    except Exception as e:
-        logger.error(f"获取技能列表失败: {e}")
-        raise HTTPException(status_code=500, detail=f"服务错误: {str(e)}")
+    skills = await repository.get_all_skills(active_only=active_only)
+    return [
+        SkillInfo(
+            id=s.id,
+            name=s.name,
+            name_en=s.name_en,
+            module_name=s.module.name if s.module else "",
+            description=s.description or "",
+            difficulty_level=s.difficulty_level or 1,
+            is_active=s.is_active
+        )
+        for s in skills
+    ]
 
 
 @router.get(
@@ -110,24 +108,18 @@ async def get_skill_by_id(
     repository: SkillRepository = Depends(get_repository)
 ) -> SkillInfo:
     """获取单个技能详情"""
-    try:
-        skill = await repository.get_skill_by_id(skill_id)
-        if not skill:
-            raise HTTPException(status_code=404, detail="技能不存在")
-        return SkillInfo(
-            id=skill.id,
-            name=skill.name,
-            name_en=skill.name_en,
-            module_name=skill.module.name if skill.module else "",
-            description=skill.description or "",
-            difficulty_level=skill.difficulty_level or 1,
-            is_active=skill.is_active
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"获取技能详情失败: {e}")
-        raise HTTPException(status_code=500, detail=f"服务错误: {str(e)}")
+    skill = await repository.get_skill_by_id(skill_id)
+    if not skill:
+        raise HTTPException(status_code=404, detail="技能不存在")
+    return SkillInfo(
+        id=skill.id,
+        name=skill.name,
+        name_en=skill.name_en,
+        module_name=skill.module.name if skill.module else "",
+        description=skill.description or "",
+        difficulty_level=skill.difficulty_level or 1,
+        is_active=skill.is_active
+    )
 
 
 # ==================== 模块API ====================
@@ -138,26 +130,24 @@ async def get_skill_by_id(
     summary="获取DBT模块列表",
     description="获取所有DBT四大模块信息"
 )
+@cache.cached(cache.MODULES_KEY, ttl=cache.LIST_TTL)
 async def get_all_modules(
     repository: SkillRepository = Depends(get_repository)
 ) -> List[ModuleInfo]:
     """获取所有模块列表"""
-    try:
-        modules = await repository.get_all_modules()
-        result = []
-        for m in modules:
-            skills = await repository.get_skills_by_module(m.id)
-            result.append(ModuleInfo(
-                id=m.id,
-                name=m.name,
-                name_en=m.name_en,
-                description=m.description or "",
-                skill_count=len(skills)
-            ))
-        return result
-    except Exception as e:
-        logger.error(f"获取模块列表失败: {e}")
-        raise HTTPException(status_code=500, detail=f"服务错误: {str(e)}")
+    modules = await repository.get_all_modules()
+    # 一次 GROUP BY 查询得到各模块的技能数，不再逐个模块加载技能
+    skill_counts = await repository.get_module_skill_counts(by_id=True)
+    return [
+        ModuleInfo(
+            id=m.id,
+            name=m.name,
+            name_en=m.name_en,
+            description=m.description or "",
+            skill_count=skill_counts.get(m.id, 0)
+        )
+        for m in modules
+    ]
 
 
 # ==================== 健康检查 ====================
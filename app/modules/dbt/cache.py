@@ -0,0 +1,137 @@
+"""
+DBT 读接口响应缓存
+设置 REDIS_URL 时缓存保存在 Redis 中，多个 worker 共享；否则退化为进程内字典。
+缓存内容为序列化后的 JSON 字节，命中时直接返回，不再查询数据库。
+技能、模块、规则变更后由对应的管理接口调用 invalidate 清除相关缓存。
+"""
+
+import fnmatch
+import functools
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from loguru import logger
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+# 缓存 key（供 cached 与 invalidate 共用）
+RULES_KEY = "dbt:admin:rules:{active_only}"
+ADMIN_SKILLS_KEY = "dbt:admin:skills:{active_only}"
+SKILLS_KEY = "dbt:skills:{active_only}"
+MODULES_KEY = "dbt:modules"
+STATS_KEY = "dbt:admin:stats"
+
+LIST_TTL = 20
+STATS_TTL = 60
+
+_redis = None
+
+_redis_url = os.getenv("REDIS_URL")
+if _redis_url:
+    if REDIS_AVAILABLE:
+        _redis = aioredis.from_url(_redis_url)
+        logger.info("DBT 响应缓存使用 Redis")
+    else:
+        logger.warning("已设置 REDIS_URL 但未安装 redis，DBT 响应缓存使用进程内存储")
+
+# key -> (过期时间, JSON 字节)
+_local: Dict[str, Tuple[float, bytes]] = {}
+
+
+async def _get(key: str) -> Optional[bytes]:
+    if _redis is not None:
+        return await _redis.get(key)
+
+    entry = _local.get(key)
+    if entry is None:
+        return None
+    expires, body = entry
+    if time.monotonic() >= expires:
+        _local.pop(key, None)
+        return None
+    return body
+
+
+async def _set(key: str, body: bytes, ttl: int):
+    if _redis is not None:
+        await _redis.set(key, body, ex=ttl)
+        return
+    _local[key] = (time.monotonic() + ttl, body)
+
+
+async def invalidate(*patterns: str):
+    """
+    清除匹配的缓存
+
+    Args:
+        patterns: glob 形式的 key，如 "dbt:admin:rules:*"
+    """
+    try:
+        if _redis is not None:
+            keys = []
+            for pattern in patterns:
+                keys.extend([key async for key in _redis.scan_iter(match=pattern)])
+            if keys:
+                await _redis.delete(*keys)
+            return
+
+        for key in [k for k in _local if any(fnmatch.fnmatchcase(k, p) for p in patterns)]:
+            _local.pop(key, None)
+    except Exception as e:
+        logger.warning("清除 DBT 缓存失败 {}: {}", patterns, e)
+
+
+def _pattern(key_template: str) -> str:
+    """将 key 模板中的参数替换为通配符"""
+    return key_template.split("{", 1)[0] + "*" if "{" in key_template else key_template
+
+
+async def invalidate_rules():
+    """规则变更后清除规则列表与统计缓存"""
+    await invalidate(_pattern(RULES_KEY), STATS_KEY)
+
+
+async def invalidate_skills():
+    """技能或模块变更后清除技能、模块列表与统计缓存"""
+    await invalidate(_pattern(ADMIN_SKILLS_KEY), _pattern(SKILLS_KEY), MODULES_KEY, STATS_KEY)
+
+
+def cached(key: str, ttl: int) -> Callable:
+    """
+    缓存路由处理函数的 JSON 响应
+
+    Args:
+        key: 缓存 key 模板，按处理函数的参数格式化，如 "dbt:admin:rules:{active_only}"
+        ttl: 过期时间（秒）
+
+    注意须放在路由装饰器之下，依赖（如管理员校验）仍在每次请求时执行。
+    """
+    def decorator(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Response]]:
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs) -> Response:
+            cache_key = key.format(**kwargs)
+            try:
+                body = await _get(cache_key)
+            except Exception as e:
+                logger.warning("读取 DBT 缓存失败 {}: {}", cache_key, e)
+                body = None
+
+            if body is None:
+                body = orjson.dumps(jsonable_encoder(await fn(*args, **kwargs)))
+                try:
+                    await _set(cache_key, body, ttl)
+                except Exception as e:
+                    logger.warning("写入 DBT 缓存失败 {}: {}", cache_key, e)
+
+            return Response(content=body, media_type="application/json")
+        return wrapper
+    return decorator
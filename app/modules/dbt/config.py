@@ -25,6 +25,12 @@ class DatabaseConfig(BaseSettings):
     """数据库配置"""
     url: str = "sqlite+aiosqlite:///./data/dbt_skills.db"
     echo: bool = False
+    # 连接池：pool_size + max_overflow 应不小于预期的并发请求数，否则请求会排队等待连接；
+    # 对 PostgreSQL 等服务端数据库还需小于服务端 max_connections / worker 数
+    pool_size: int = 20
+    max_overflow: int = 20
+    # 取连接前检测是否仍可用（仅对服务端数据库生效，SQLite 文件库无需检测）
+    pool_pre_ping: bool = True
 
 
 class LLMConfig(BaseSettings):
@@ -58,6 +64,8 @@ class Settings(BaseSettings):
     llm: LLMConfig = LLMConfig()
     recommendation: RecommendationConfig = RecommendationConfig()
     cache: CacheConfig = CacheConfig()
+    # 管理员密钥（实际生产环境应使用更安全的认证方式），可通过环境变量 DBT_ADMIN_API_KEY 配置
+    admin_api_key: str = Field(default="dbt-admin-secret-key", alias="DBT_ADMIN_API_KEY")
 
     class Config:
         env_file = ".env"
@@ -95,7 +103,7 @@ def load_yaml_config(config_path: Optional[str] = None) -> dict:
     return replace_env_vars(config)
 
 
-@lru_cache()
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
     """获取配置单例"""
     yaml_config = load_yaml_config()
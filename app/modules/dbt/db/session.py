@@ -9,6 +9,7 @@ from typing import AsyncGenerator
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 
 from ..config import get_settings
 from ..models.database import Base
@@ -16,11 +17,28 @@ from ..models.database import Base
 
 settings = get_settings()
 
+_url = make_url(settings.database.url)
+if _url.get_backend_name() != "sqlite":
+    pool_kwargs = {
+        "pool_size": settings.database.pool_size,
+        "max_overflow": settings.database.max_overflow,
+        "pool_pre_ping": settings.database.pool_pre_ping,
+    }
+elif _url.database not in (None, "", ":memory:"):
+    # SQLite 文件库同样复用连接；内存库使用 StaticPool，不接受连接池参数
+    pool_kwargs = {
+        "pool_size": settings.database.pool_size,
+        "max_overflow": settings.database.max_overflow,
+    }
+else:
+    pool_kwargs = {}
+
 # 异步引擎（用于FastAPI）
 engine = create_async_engine(
     settings.database.url,
     echo=settings.database.echo,
-    future=True
+    future=True,
+    **pool_kwargs
 )
 
 # 异步会话工厂
@@ -48,12 +66,9 @@ def init_db_sync():
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """FastAPI依赖注入：获取数据库会话"""
+    """FastAPI依赖注入：获取数据库会话（退出 async with 时关闭会话并归还连接）"""
     async with AsyncSessionLocal() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+        yield session
 
 
 @asynccontextmanager
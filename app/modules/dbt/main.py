@@ -5,7 +5,8 @@ DBT技能推荐模块主程序
 
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+import orjson
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 
@@ -76,15 +77,19 @@ app.include_router(router, prefix="/api/v1/dbt", tags=["DBT推荐"])
 app.include_router(admin_router, prefix="/api/v1/admin", tags=["管理员"])
 
 
+# 根路径返回内容固定，启动时序列化一次
+_ROOT_JSON = orjson.dumps({
+    "name": "DBT技能推荐模块",
+    "version": "0.1.0",
+    "docs": "/docs",
+    "health": "/api/v1/dbt/health"
+})
+
+
 @app.get("/", tags=["Root"])
 async def root():
     """根路径"""
-    return {
-        "name": "DBT技能推荐模块",
-        "version": "0.1.0",
-        "docs": "/docs",
-        "health": "/api/v1/dbt/health"
-    }
+    return Response(content=_ROOT_JSON, media_type="application/json")
 
 
 # ============== 测试用例 ==============
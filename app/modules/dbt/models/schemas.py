@@ -4,7 +4,7 @@ Pydantic模型定义
 """
 
 from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 from .enums import (
     RiskLevel, GuidanceApproach, GuidanceIntensity, GuidanceTone, DialogueGoal
@@ -215,8 +215,17 @@ class RuleUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+def _orm_to_dict(model: type, obj: Any) -> Dict[str, Any]:
+    """按模型字段读取 ORM 对象属性，module_name 取自已预加载的 obj.module"""
+    data = {name: getattr(obj, name) for name in model.model_fields if name != "module_name"}
+    data["module_name"] = obj.module.name if obj.module else None
+    return data
+
+
 class RuleInfo(BaseModel):
-    """规则信息"""
+    """规则信息（可直接由 ORM 对象 model_validate）"""
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     rule_name: str
     priority: int
@@ -227,6 +236,15 @@ class RuleInfo(BaseModel):
     description: Optional[str]
     is_active: bool
 
+    @model_validator(mode="before")
+    @classmethod
+    def _from_orm(cls, data: Any) -> Any:
+        if isinstance(data, dict):
+            return data
+        data = _orm_to_dict(cls, data)
+        data["skill_ids"] = data["skill_ids"] or []
+        return data
+
 
 class SkillCreate(BaseModel):
     """创建技能请求"""
@@ -255,7 +273,9 @@ class SkillUpdate(BaseModel):
 
 
 class SkillDetail(BaseModel):
-    """技能详情"""
+    """技能详情（可直接由 ORM 对象 model_validate）"""
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     module_id: int
     module_name: str
@@ -268,6 +288,16 @@ class SkillDetail(BaseModel):
     difficulty_level: int
     is_active: bool
 
+    @model_validator(mode="before")
+    @classmethod
+    def _from_orm(cls, data: Any) -> Any:
+        if isinstance(data, dict):
+            return data
+        data = _orm_to_dict(cls, data)
+        data["module_name"] = data["module_name"] or ""
+        data["difficulty_level"] = data["difficulty_level"] or 1
+        return data
+
 
 class AdminStats(BaseModel):
     """管理统计信息"""
@@ -3,11 +3,11 @@
 提供对DBT技能库和匹配规则的数据访问操作
 """
 
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 
-from sqlalchemy import select, and_
+from sqlalchemy import and_, case, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import raiseload, selectinload
 
 from ..models.database import DBTModule, DBTSkill, SkillMatchingRule
 
@@ -17,6 +17,8 @@ class SkillRepository:
 
     def __init__(self, session: AsyncSession):
         self.session = session
+        # 模块查询缓存：仓库实例随请求（会话）创建，缓存不会跨请求
+        self._module_cache: Dict[int, DBTModule] = {}
 
     # ==================== 模块操作 ====================
 
@@ -28,11 +30,16 @@ class SkillRepository:
         return list(result.scalars().all())
 
     async def get_module_by_id(self, module_id: int) -> Optional[DBTModule]:
-        """根据ID获取模块"""
-        result = await self.session.execute(
-            select(DBTModule).where(DBTModule.id == module_id)
-        )
-        return result.scalar_one_or_none()
+        """根据ID获取模块（同一仓库实例内重复查询同一模块时直接返回缓存）"""
+        module = self._module_cache.get(module_id)
+        if module is None:
+            result = await self.session.execute(
+                select(DBTModule).where(DBTModule.id == module_id)
+            )
+            module = result.scalar_one_or_none()
+            if module is not None:
+                self._module_cache[module_id] = module
+        return module
 
     async def get_module_by_name(self, name: str) -> Optional[DBTModule]:
         """根据名称获取模块（支持中英文）"""
@@ -73,6 +80,15 @@ class SkillRepository:
         )
         return list(result.scalars().all())
 
+    async def get_existing_skill_ids(self, skill_ids: List[int]) -> Set[int]:
+        """返回给定ID中实际存在的技能ID（单次 IN 查询）"""
+        if not skill_ids:
+            return set()
+        result = await self.session.execute(
+            select(DBTSkill.id).where(DBTSkill.id.in_(skill_ids))
+        )
+        return set(result.scalars().all())
+
     async def get_skill_by_name(self, name: str) -> Optional[DBTSkill]:
         """根据名称获取技能（支持中英文）"""
         result = await self.session.execute(
@@ -108,18 +124,37 @@ class SkillRepository:
 
     # ==================== 规则操作 ====================
 
-    async def get_all_rules(self, active_only: bool = True) -> List[SkillMatchingRule]:
-        """获取所有匹配规则（按优先级排序）"""
-        query = select(SkillMatchingRule).order_by(SkillMatchingRule.priority.desc())
+    @staticmethod
+    def _rules_with_module():
+        """
+        规则查询，一并预加载所属模块（一次额外的 IN 查询，而不是每条规则单独查询）
+
+        其余关联设为 raiseload，异步会话中意外的懒加载会立即报错而不是隐式发起 I/O。
+        """
+        return select(SkillMatchingRule).options(
+            selectinload(SkillMatchingRule.module),
+            raiseload("*")
+        )
+
+    async def get_all_rules(
+        self,
+        active_only: bool = True,
+        with_module: bool = False
+    ) -> List[SkillMatchingRule]:
+        """获取所有匹配规则（按优先级排序），with_module 为 True 时预加载 rule.module"""
+        query = self._rules_with_module() if with_module else select(SkillMatchingRule)
+        query = query.order_by(SkillMatchingRule.priority.desc())
         if active_only:
             query = query.where(SkillMatchingRule.is_active == True)
         result = await self.session.execute(query)
         return list(result.scalars().all())
 
     async def get_rule_by_id(self, rule_id: int) -> Optional[SkillMatchingRule]:
-        """根据ID获取规则"""
+        """根据ID获取规则（预加载 rule.module）"""
         result = await self.session.execute(
-            select(SkillMatchingRule).where(SkillMatchingRule.id == rule_id)
+            self._rules_with_module()
+            .where(SkillMatchingRule.id == rule_id)
+            .execution_options(populate_existing=True)
         )
         return result.scalar_one_or_none()
 
@@ -139,24 +174,61 @@ class SkillRepository:
 
     # ==================== 统计操作 ====================
 
+    async def count_modules(self) -> int:
+        """统计模块数量"""
+        result = await self.session.execute(select(func.count(DBTModule.id)))
+        return result.scalar_one()
+
+    async def get_skill_counts(self) -> Tuple[int, int]:
+        """一次聚合查询返回 (技能总数, 启用的技能数)"""
+        result = await self.session.execute(
+            select(
+                func.count(DBTSkill.id),
+                func.count(case((DBTSkill.is_active == True, 1)))
+            )
+        )
+        total, active = result.one()
+        return total, active
+
+    async def get_rule_counts(self) -> Tuple[int, int]:
+        """一次聚合查询返回 (规则总数, 启用的规则数)"""
+        result = await self.session.execute(
+            select(
+                func.count(SkillMatchingRule.id),
+                func.count(case((SkillMatchingRule.is_active == True, 1)))
+            )
+        )
+        total, active = result.one()
+        return total, active
+
     async def count_skills(self, active_only: bool = True) -> int:
         """统计技能数量"""
-        skills = await self.get_all_skills(active_only)
-        return len(skills)
+        total, active = await self.get_skill_counts()
+        return active if active_only else total
 
     async def count_rules(self, active_only: bool = True) -> int:
         """统计规则数量"""
-        rules = await self.get_all_rules(active_only)
-        return len(rules)
-
-    async def get_module_skill_counts(self) -> dict:
-        """获取每个模块的技能数量"""
-        modules = await self.get_all_modules()
-        counts = {}
-        for module in modules:
-            skills = await self.get_skills_by_module(module.id)
-            counts[module.name] = len(skills)
-        return counts
+        total, active = await self.get_rule_counts()
+        return active if active_only else total
+
+    async def get_module_skill_counts(self, by_id: bool = False) -> dict:
+        """
+        获取每个模块的启用技能数量（按模块优先级排序，单次 GROUP BY 查询）
+
+        Args:
+            by_id: 为 True 时以模块ID为键，否则以模块名称为键
+        """
+        key = DBTModule.id if by_id else DBTModule.name
+        result = await self.session.execute(
+            select(key, func.count(DBTSkill.id))
+            .outerjoin(
+                DBTSkill,
+                and_(DBTSkill.module_id == DBTModule.id, DBTSkill.is_active == True)
+            )
+            .group_by(DBTModule.id, DBTModule.name, DBTModule.priority)
+            .order_by(DBTModule.priority)
+        )
+        return {k: count for k, count in result.all()}
 
     # ==================== 规则CRUD操作（管理员） ====================
 
@@ -182,8 +254,7 @@ class SkillRepository:
         )
         self.session.add(rule)
         await self.session.commit()
-        await self.session.refresh(rule)
-        return rule
+        return await self.get_rule_by_id(rule.id)
 
     async def update_rule(
         self,
@@ -200,8 +271,7 @@ class SkillRepository:
                 setattr(rule, key, value)
 
         await self.session.commit()
-        await self.session.refresh(rule)
-        return rule
+        return await self.get_rule_by_id(rule_id)
 
     async def delete_rule(self, rule_id: int) -> bool:
         """删除规则"""
@@ -221,8 +291,7 @@ class SkillRepository:
 
         rule.is_active = not rule.is_active
         await self.session.commit()
-        await self.session.refresh(rule)
-        return rule
+        return await self.get_rule_by_id(rule_id)
 
     async def get_rule_by_name(self, rule_name: str) -> Optional[SkillMatchingRule]:
         """根据规则名称获取规则"""
@@ -257,9 +326,10 @@ class SkillRepository:
             difficulty_level=difficulty_level,
             is_active=is_active
         )
+        # 直接关联模块对象（调用方校验 module_id 时已查询并缓存），提交后无需重新加载
+        skill.module = await self.get_module_by_id(module_id)
         self.session.add(skill)
         await self.session.commit()
-        await self.session.refresh(skill)
         return skill
 
     async def update_skill(
@@ -276,8 +346,11 @@ class SkillRepository:
             if value is not None and hasattr(skill, key):
                 setattr(skill, key, value)
 
+        # 更换模块时同步已加载的 module 关系，其余字段已是最新值，提交后无需重新加载
+        if skill.module is None or skill.module.id != skill.module_id:
+            skill.module = await self.get_module_by_id(skill.module_id)
+
         await self.session.commit()
-        await self.session.refresh(skill)
         return skill
 
     async def delete_skill(self, skill_id: int) -> bool:
@@ -298,7 +371,6 @@ class SkillRepository:
 
         skill.is_active = not skill.is_active
         await self.session.commit()
-        await self.session.refresh(skill)
         return skill
 
 
@@ -4,6 +4,7 @@
 """
 
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Union
 from datetime import datetime
 from pathlib import Path
@@ -22,6 +23,10 @@ from app.services.profile import (
 )
 
 
+# 批量分析时并发提取特征的最大线程数
+BATCH_MAX_WORKERS = 8
+
+
 class EmotionRecognitionEngine:
     """情绪识别引擎主类"""
 
@@ -80,8 +85,33 @@ class EmotionRecognitionEngine:
         Returns:
             完整的分析结果字典
         """
-        logger.info(f"开始分析用户 {user_id} 的情绪状态")
+        logger.info("开始分析用户 {} 的情绪状态", user_id)
+
+        features = self._extract_features(
+            text=text,
+            audio_path=audio_path,
+            audio_data=audio_data,
+            video_path=video_path,
+            video_data=video_data
+        )
+
+        return self._analyze_features(
+            features=features,
+            text=text,
+            user_id=user_id,
+            audio_path=audio_path,
+            video_data=video_data,
+            context=context
+        )
 
+    def _extract_features(self, text: str,
+                          audio_path: Optional[str] = None,
+                          audio_data: Optional[Dict] = None,
+                          video_path: Optional[str] = None,
+                          video_data: Optional[np.ndarray] = None) -> EmotionFeatures:
+        """
+        提取情绪特征（无状态，可并发调用）
+        """
         # 1. 提取情绪特征
         logger.info("步骤1: 提取情绪特征")
         features = self.extractor.extract(
@@ -109,8 +139,19 @@ class EmotionRecognitionEngine:
                             features.text_emotion.get(emotion, 0),
                             score * 0.8  # 图像情绪权重0.8
                         )
-                    logger.info(f"融合图像情绪到text_emotion: {video_emotions}")
+                    logger.info("融合图像情绪到text_emotion: {}", video_emotions)
 
+        return features
+
+    def _analyze_features(self, features: EmotionFeatures,
+                          text: str,
+                          user_id: str,
+                          audio_path: Optional[str] = None,
+                          video_data: Optional[np.ndarray] = None,
+                          context: str = "") -> Dict:
+        """
+        基于已提取的特征完成路由、风险评估和画像更新（会修改用户状态，需按顺序调用）
+        """
         # 2. 智能路由
         logger.info("步骤2: 执行智能路由")
         route_result = self.router.route(
@@ -251,7 +292,7 @@ class EmotionRecognitionEngine:
             )
         }
 
-        logger.info(f"分析完成 - 路由级别: {route_result.level.value}, 风险等级: {intervention_trigger.risk_level.value}")
+        logger.info("分析完成 - 路由级别: {}, 风险等级: {}", route_result.level.value, intervention_trigger.risk_level.value)
 
         return result
 
@@ -358,12 +399,23 @@ class EmotionRecognitionEngine:
         logger.info(f"重置用户 {user_id} 的历史记录")
 
     def batch_analyze(self, texts: List[str], user_id: str) -> List[Dict]:
-        """批量分析（用于数据处理）"""
-        results = []
-        for text in texts:
-            result = self.analyze(text=text, user_id=user_id)
-            results.append(result)
-        return results
+        """
+        批量分析（用于数据处理）
+
+        特征提取（远程API调用）在线程池中并发执行；
+        路由、风险评估和画像更新依赖对话历史，仍按输入顺序依次执行。
+        """
+        if not texts:
+            return []
+
+        max_workers = min(BATCH_MAX_WORKERS, len(texts))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            features_list = list(pool.map(lambda t: self._extract_features(text=t), texts))
+
+        return [
+            self._analyze_features(features=features, text=text, user_id=user_id)
+            for text, features in zip(texts, features_list)
+        ]
 
     def get_system_stats(self) -> Dict:
         """获取系统统计信息"""
@@ -6,15 +6,17 @@ FastAPI server with frontend integration - following main.py pattern
 import os
 import sys
 import asyncio
+import threading
+import time
 from contextlib import asynccontextmanager
-from typing import Optional, List, Dict
+from typing import Optional
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from loguru import logger
-from datetime import datetime
+import orjson
 
 # Add app to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -23,9 +25,13 @@ from app.core.agent import SelfAgent
 from app.models.data_models import UserInput
 from app.api import auth, admin, frontend
 from app.api import profile_api
+from app.core import usage_writer
 from app.core.database import init_db, get_db
+from app.core.responses import UTCORJSONResponse
 from loguru import logger
-from app.core.memory_manager import MemoryManager
+from app.core.memory_manager import get_memory_manager
+from app.services.profile.profile_store import import_profile_files
+from app.services.conversation_buffer import ConversationBuffer
 
 # DBT 模块路由
 from app.modules.dbt.api.admin_routes import router as dbt_admin_router
@@ -64,6 +70,9 @@ async def lifespan(app: FastAPI):
         create_default_admin(db)
         db.close()
         logger.info("✓ Default admin user ready (admin@selfagent.com / admin123)")
+
+        # 首次启动时将已有画像文件导入 profiles 表
+        await asyncio.to_thread(import_profile_files, profile_api.PROFILES_DIR, True)
     except Exception as e:
         logger.error(f"✗ Failed to initialize database: {e}")
         logger.warning("Please check your database configuration in .env")
@@ -84,9 +93,10 @@ async def lifespan(app: FastAPI):
     if not os.getenv("OPENAI_API_KEY"):
         logger.warning("OPENAI_API_KEY not set! Please set it in .env file")
 
-    # Pre-initialize agent
+    # Pre-initialize agents so the first chat request doesn't pay for it
     try:
         get_agent()
+        frontend.get_agent()
         logger.info("✓ Agent initialized and ready")
     except Exception as e:
         logger.error(f"✗ Failed to initialize agent: {e}")
@@ -97,6 +107,18 @@ async def lifespan(app: FastAPI):
     """Cleanup on shutdown"""
     logger.info("Shutting down Self-Agent server...")
 
+    # 写入尚在缓冲中的长期记忆（与 frontend 共用同一个 MemoryManager）
+    try:
+        _memory_manager.flush()
+    except Exception as e:
+        logger.error(f"✗ Failed to flush memories: {e}")
+
+    # 写入尚未落库的额度使用记录
+    try:
+        await usage_writer.flush()
+    except Exception as e:
+        logger.error(f"✗ Failed to flush usage records: {e}")
+
 
 # ==================== Create FastAPI App ====================
 
@@ -104,7 +126,8 @@ app = FastAPI(
     title="Self-Agent API",
     description="智能情绪支持系统 API",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=UTCORJSONResponse
 )
 
 # Configure CORS
@@ -114,6 +137,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ==================== API Routes ====================
@@ -133,18 +157,21 @@ app.include_router(dbt_public_router, prefix="/api/v1/dbt", tags=["DBT技能"])
 
 # Global agent instance (following main.py pattern)
 _agent_instance: Optional[SelfAgent] = None
-_memory_manager = MemoryManager(persist_path="./data/chroma_db")
-_conversation_buffers: Dict[str, List[Dict]] = {}
+_agent_init_lock = threading.Lock()  # 启动失败后首个请求再初始化时，防止并发重复创建
+_memory_manager = get_memory_manager("./data/chroma_db")
+_conversation_buffer = ConversationBuffer(key_prefix="buf:api:")  # 与 /api/frontend 的缓冲分开
 
 
 def get_agent() -> SelfAgent:
     """Get or create agent instance - exactly like main.py"""
     global _agent_instance
     if _agent_instance is None:
-        model_name = os.getenv("MODEL_NAME", "deepseek-chat")
-        logger.info(f"Initializing Self-Agent with model: {model_name}")
-        _agent_instance = SelfAgent(model_type=model_name)
-        logger.info("Self-Agent initialized successfully")
+        with _agent_init_lock:
+            if _agent_instance is None:
+                model_name = os.getenv("MODEL_NAME", "deepseek-chat")
+                logger.info(f"Initializing Self-Agent with model: {model_name}")
+                _agent_instance = SelfAgent(model_type=model_name)
+                logger.info("Self-Agent initialized successfully")
     return _agent_instance
 
 
@@ -157,11 +184,11 @@ async def chat_endpoint(request: ChatRequest) -> ChatResponse:
 
     This endpoint mimics the exact flow from main.py:
     1. Create UserInput object
-    2. Call agent.process_interaction(user_input)
+    2. Call agent.aprocess_interaction(user_input)
     3. Return the response
     """
     try:
-        logger.info(f"Received message from {request.user_id}: {request.text[:50]}...")
+        logger.opt(lazy=True).info("Received message from {}: {}...", lambda: request.user_id, lambda: request.text[:50])
 
         # Get agent instance
         agent = get_agent()
@@ -174,18 +201,19 @@ async def chat_endpoint(request: ChatRequest) -> ChatResponse:
 
         # Process interaction (exactly like main.py)
         logger.info("Processing interaction...")
-        response = agent.process_interaction(user_input)
+        response = await agent.aprocess_interaction(user_input)
 
         buf_key = request.user_id
-        buf = _conversation_buffers.get(buf_key, [])
-        buf.append({"role": "user", "content": request.text, "ts": datetime.now().isoformat()})
-        buf.append({"role": "assistant", "content": response, "ts": datetime.now().isoformat()})
-        _conversation_buffers[buf_key] = buf
-        if len(buf) >= 12:
-            summary = await _memory_manager.compress_and_archive(buf_key, buf, agent_instance=agent)
-            _conversation_buffers[buf_key] = buf[-2:]
+        now = time.time_ns()
+        await _conversation_buffer.append(
+            buf_key,
+            {"role": "user", "content": request.text, "ts": now},
+            {"role": "assistant", "content": response, "ts": now}
+        )
+        # 压缩归档在后台进行，不阻塞本次响应
+        _conversation_buffer.schedule_compress(buf_key, _memory_manager, agent)
 
-        logger.info(f"Agent response: {response[:100]}...")
+        logger.opt(lazy=True).info("Agent response: {}...", lambda: response[:100])
 
         return ChatResponse(
             response=response,
@@ -210,7 +238,7 @@ async def chat_multimodal_endpoint(
     Process multimodal chat (audio/image) - following main.py pattern
     """
     try:
-        logger.info(f"Multimodal chat from {user_id}, file: {file.filename if file else 'None'}")
+        logger.opt(lazy=True).info("Multimodal chat from {}, file: {}", lambda: user_id, lambda: file.filename if file else 'None')
 
         agent = get_agent()
 
@@ -225,16 +253,17 @@ async def chat_multimodal_endpoint(
             text=message_text
         )
 
-        response = agent.process_interaction(user_input)
+        response = await agent.aprocess_interaction(user_input)
 
         buf_key = user_id
-        buf = _conversation_buffers.get(buf_key, [])
-        buf.append({"role": "user", "content": message_text, "ts": datetime.now().isoformat()})
-        buf.append({"role": "assistant", "content": response, "ts": datetime.now().isoformat()})
-        _conversation_buffers[buf_key] = buf
-        if len(buf) >= 12:
-            summary = await _memory_manager.compress_and_archive(buf_key, buf, agent_instance=agent)
-            _conversation_buffers[buf_key] = buf[-2:]
+        now = time.time_ns()
+        await _conversation_buffer.append(
+            buf_key,
+            {"role": "user", "content": message_text, "ts": now},
+            {"role": "assistant", "content": response, "ts": now}
+        )
+        # 压缩归档在后台进行，不阻塞本次响应
+        _conversation_buffer.schedule_compress(buf_key, _memory_manager, agent)
 
         return ChatResponse(
             response=response,
@@ -249,15 +278,25 @@ async def chat_multimodal_endpoint(
         )
 
 
-@app.get("/api/health")
-async def health_check():
-    """Health check endpoint"""
-    return {
+# 健康检查只有两种响应，按 agent 是否初始化预先序列化
+_HEALTH_JSON = {
+    initialized: orjson.dumps({
         "status": "ok",
         "service": "selfagent",
         "version": "2.0.0",
-        "agent_initialized": _agent_instance is not None
-    }
+        "agent_initialized": initialized
+    })
+    for initialized in (False, True)
+}
+
+
+@app.get("/api/health")
+async def health_check():
+    """Health check endpoint"""
+    return Response(
+        content=_HEALTH_JSON[_agent_instance is not None],
+        media_type="application/json"
+    )
 
 
 # ==================== Frontend Static Files ====================
@@ -326,10 +365,19 @@ if __name__ == "__main__":
 
     logger.info("Starting Self-Agent web server...")
 
+    # 开发模式（RELOAD=true）单进程热重载；否则按 WEB_CONCURRENCY 启动多个 worker。
+    # 语义缓存、登录限流等状态保存在进程内，多 worker 时各自独立；会话缓冲需设置 REDIS_URL 才能共享。
+    reload = os.getenv("RELOAD", "false").lower() == "true"
+    workers = 1 if reload else int(os.getenv("WEB_CONCURRENCY", "1"))
+
     uvicorn.run(
         "app.server:app",
         host="0.0.0.0",
-        port=8000,
-        reload=True,
+        port=int(os.getenv("PORT", "8000")),
+        reload=reload,
+        workers=workers,
+        loop="auto",  # 已安装 uvloop 时自动使用
+        http="httptools",
+        access_log=reload,
         log_level="info"
     )
@@ -0,0 +1,166 @@
+"""
+会话缓冲服务
+保存每个用户最近的对话轮次（工作记忆），达到阈值后压缩归档到长期记忆
+
+设置 REDIS_URL 时缓冲保存在 Redis 中，多个 worker 共享同一份数据；
+否则退化为进程内存储。两种后端都只保留最近 max_entries 条消息并按 TTL 过期。
+消息的 ts 为 time.time_ns() 整数，需要展示时再格式化。
+压缩归档在后台任务中进行，不占用聊天请求的响应时间。
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import orjson
+from loguru import logger
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+# 原子地删除列表中第一个等于 ARGV[1] 的元素及其之前的元素；找不到时不修改（返回 -1）
+_DROP_THROUGH_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+for i, item in ipairs(items) do
+    if item == ARGV[1] then
+        redis.call('LTRIM', KEYS[1], i, -1)
+        return i
+    end
+end
+return -1
+"""
+
+
+class ConversationBuffer:
+    """
+    按用户隔离的会话缓冲
+
+    append 追加消息并截断到最近 max_entries 条（即 RPUSH + LTRIM + EXPIRE），
+    maybe_compress 达到阈值后压缩归档，并按内容删除已归档的消息（drop_through）。
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        max_entries: int = 24,
+        ttl_seconds: int = 24 * 3600,
+        key_prefix: str = "buf:",
+        compress_threshold: int = 12,
+        keep_after_compress: int = 2
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self.compress_threshold = compress_threshold
+        self.keep_after_compress = keep_after_compress
+        self._redis = None
+        # user_id -> (消息列表, 最后写入时间)
+        self._local: Dict[str, Tuple[List[Dict], float]] = {}
+        self._lock = asyncio.Lock()
+        # 正在压缩的用户，避免同一用户并发压缩
+        self._compressing: Set[str] = set()
+        # 持有后台任务引用，防止任务未完成就被回收
+        self._tasks: Set[asyncio.Task] = set()
+
+        redis_url = redis_url if redis_url is not None else os.getenv("REDIS_URL")
+        if redis_url:
+            if REDIS_AVAILABLE:
+                self._redis = aioredis.from_url(redis_url)
+                self._drop_through_script = self._redis.register_script(_DROP_THROUGH_SCRIPT)
+                logger.info("会话缓冲使用 Redis 存储")
+            else:
+                logger.warning("已设置 REDIS_URL 但未安装 redis，会话缓冲使用进程内存储")
+
+    def _key(self, user_id: str) -> str:
+        return f"{self.key_prefix}{user_id}"
+
+    def _evict_expired(self, now: float):
+        """淘汰过期的进程内缓冲（调用方持有锁）"""
+        expired = [uid for uid, (_, ts) in self._local.items() if now - ts > self.ttl_seconds]
+        for uid in expired:
+            del self._local[uid]
+
+    async def append(self, user_id: str, *messages: Dict) -> int:
+        """
+        追加消息
+
+        Returns:
+            追加后缓冲中的消息数
+        """
+        if self._redis is not None:
+            key = self._key(user_id)
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.rpush(key, *(orjson.dumps(m) for m in messages))
+                pipe.ltrim(key, -self.max_entries, -1)
+                pipe.expire(key, self.ttl_seconds)
+                pipe.llen(key)
+                results = await pipe.execute()
+            return int(results[-1])
+
+        now = time.time()
+        async with self._lock:
+            self._evict_expired(now)
+            buf, _ = self._local.get(user_id, ([], now))
+            buf = (buf + list(messages))[-self.max_entries:]
+            self._local[user_id] = (buf, now)
+            return len(buf)
+
+    async def get(self, user_id: str) -> List[Dict]:
+        """读取用户当前缓冲的全部消息"""
+        if self._redis is not None:
+            return [orjson.loads(item) for item in await self._redis.lrange(self._key(user_id), 0, -1)]
+
+        async with self._lock:
+            buf, ts = self._local.get(user_id, ([], 0.0))
+            if time.time() - ts > self.ttl_seconds:
+                return []
+            return list(buf)
+
+    async def drop_through(self, user_id: str, message: Dict):
+        """
+        删除 message 及其之前的所有消息（压缩期间新追加的消息会保留）
+
+        按消息内容定位而不是按条数：压缩期间 append 的截断可能已经移走了列表头部，
+        按条数删除会误删尚未归档的消息。message 已被截断移走时不做任何删除。
+        """
+        if self._redis is not None:
+            await self._drop_through_script(keys=[self._key(user_id)], args=[orjson.dumps(message)])
+            return
+
+        async with self._lock:
+            if user_id in self._local:
+                buf, ts = self._local[user_id]
+                for i, item in enumerate(buf):
+                    if item == message:
+                        self._local[user_id] = (buf[i + 1:], ts)
+                        break
+
+    async def maybe_compress(self, user_id: str, memory_manager: Any, agent: Any):
+        """缓冲达到阈值时压缩归档到长期记忆，只保留末尾几条消息"""
+        if user_id in self._compressing:
+            # 该用户已有压缩在进行，本轮追加的消息留给下次
+            return
+        self._compressing.add(user_id)
+        try:
+            buf = await self.get(user_id)
+            if len(buf) < self.compress_threshold:
+                return
+            await memory_manager.compress_and_archive(user_id, buf, agent_instance=agent)
+            archived = len(buf) - self.keep_after_compress
+            if archived > 0:
+                await self.drop_through(user_id, buf[archived - 1])
+        except Exception as e:
+            logger.error(f"会话缓冲压缩失败 {user_id}: {e}")
+        finally:
+            self._compressing.discard(user_id)
+
+    def schedule_compress(self, user_id: str, memory_manager: Any, agent: Any):
+        """在后台任务中执行 maybe_compress，调用方无需等待"""
+        task = asyncio.create_task(self.maybe_compress(user_id, memory_manager, agent))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -3,7 +3,7 @@
 提供多维度、预测性的用户情绪分析
 """
 
-import json
+import orjson
 import numpy as np
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict, field
@@ -15,6 +15,28 @@ from scipy import stats
 from scipy.signal import find_peaks
 import hashlib
 
+from .profile_store import PROFILE_JSON_OPTIONS, save_profile_record
+
+
+def emotion_matrix(snapshots: List["EmotionSnapshot"]) -> Tuple[List[str], np.ndarray]:
+    """
+    将快照的情绪字典转换为矩阵（每行一个快照，每列一种情绪，缺失为 0）
+
+    Returns:
+        (情绪名称列表, shape 为 (快照数, 情绪数) 的 float64 矩阵)
+    """
+    index: Dict[str, int] = {}
+    for s in snapshots:
+        for name in s.emotions:
+            index.setdefault(name, len(index))
+
+    matrix = np.zeros((len(snapshots), len(index)), dtype=np.float64)
+    for row, s in enumerate(snapshots):
+        for name, score in s.emotions.items():
+            matrix[row, index[name]] = score
+
+    return list(index), matrix
+
 
 @dataclass
 class EmotionSnapshot:
@@ -200,8 +222,7 @@ class AdvancedEmotionProfileManager:
             return None
 
         try:
-            with open(profile_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = orjson.loads(profile_path.read_bytes())
 
             # 重建嵌套对象
             snapshots = [EmotionSnapshot(**s) for s in data.get('snapshots', [])]
@@ -379,34 +400,31 @@ class AdvancedEmotionProfileManager:
 
         weights = [(s.timestamp - min_ts) / time_span for s in recent_snapshots]
 
-        # 计算加权平均
-        baseline = {}
-        emotion_names = set()
-        for s in recent_snapshots:
-            emotion_names.update(s.emotions.keys())
-
-        for emotion in emotion_names:
-            scores = [s.emotions.get(emotion, 0.0) for s in recent_snapshots]
-
-            # 去除异常值（使用IQR方法）
-            if len(scores) >= 4:
-                q1, q3 = np.percentile(scores, [25, 75])
-                iqr = q3 - q1
-                lower_bound = q1 - 1.5 * iqr
-                upper_bound = q3 + 1.5 * iqr
-
-                filtered_scores = [s for s in scores if lower_bound <= s <= upper_bound]
-                filtered_weights = [w for s, w in zip(scores, weights) if lower_bound <= s <= upper_bound]
-            else:
-                filtered_scores = scores
-                filtered_weights = weights
-
-            if sum(filtered_weights) > 0:
-                baseline[emotion] = float(np.average(filtered_scores, weights=filtered_weights))
-            else:
-                baseline[emotion] = 0.0
+        # 计算加权平均（按列向量化：每列一种情绪）
+        names, scores = emotion_matrix(recent_snapshots)
+        if not names:
+            return {}
+        weights = np.asarray(weights, dtype=np.float64)
+
+        # 去除异常值（使用IQR方法）
+        if len(recent_snapshots) >= 4:
+            q1, q3 = np.percentile(scores, [25, 75], axis=0)
+            iqr = q3 - q1
+            lower_bound = q1 - 1.5 * iqr
+            upper_bound = q3 + 1.5 * iqr
+            mask = (scores >= lower_bound) & (scores <= upper_bound)
+        else:
+            mask = np.ones(scores.shape, dtype=bool)
+
+        masked_weights = mask * weights[:, np.newaxis]
+        weight_sums = masked_weights.sum(axis=0)
+        weighted_sums = (scores * masked_weights).sum(axis=0)
+        averages = np.divide(
+            weighted_sums, weight_sums,
+            out=np.zeros_like(weighted_sums), where=weight_sums > 0
+        )
 
-        return baseline
+        return {name: float(avg) for name, avg in zip(names, averages)}
 
     def _analyze_trend(self, snapshots: List[EmotionSnapshot]) -> EmotionTrend:
         """
@@ -655,26 +673,19 @@ class AdvancedEmotionProfileManager:
         if len(snapshots) < 3:
             return network
 
-        # 计算共现矩阵
-        co_occurrence = defaultdict(lambda: defaultdict(int))
+        # 计算共现矩阵：present[t, i] 表示第 t 个快照中情绪 i 明显出现（>0.1）
+        names, scores = emotion_matrix(snapshots)
+        present = (scores > 0.1).astype(np.int64)
+        co_occurrence = present.T @ present
+        np.fill_diagonal(co_occurrence, 0)
+        totals = co_occurrence.sum(axis=1)
 
-        for s in snapshots:
-            emotions = [k for k, v in s.emotions.items() if v > 0.1]
-            for e1 in emotions:
-                for e2 in emotions:
-                    if e1 != e2:
-                        co_occurrence[e1][e2] += 1
-
-        # 归一化并转换为关联强度
-        for e1, related in co_occurrence.items():
-            total = sum(related.values())
-            network[e1] = {e2: count / total for e2, count in related.items()}
-
-        # 只保留强关联（>0.3）
-        network = {
-            e1: {e2: s for e2, s in related.items() if s > 0.3}
-            for e1, related in network.items()
-        }
+        # 归一化为关联强度，只保留强关联（>0.3）
+        for i in np.flatnonzero(totals):
+            strengths = co_occurrence[i] / totals[i]
+            network[names[i]] = {
+                names[j]: float(strengths[j]) for j in np.flatnonzero(strengths > 0.3)
+            }
 
         return network
 
@@ -1076,7 +1087,9 @@ class AdvancedEmotionProfileManager:
             'last_analysis_date': profile.last_analysis_date
         }
 
-        with open(profile_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        profile_path.write_bytes(orjson.dumps(data, option=PROFILE_JSON_OPTIONS))
+
+        # 同步写入数据库，供管理端列表/统计查询
+        save_profile_record(data)
 
         logger.debug(f"保存高级画像: {profile.user_id}")
@@ -2,7 +2,7 @@
 情绪画像积累与Self-Agent深度同步模块
 """
 
-import json
+import orjson
 import numpy as np
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from loguru import logger
 
+from .profile_store import PROFILE_JSON_OPTIONS, save_profile_record
+
 
 @dataclass
 class EmotionSnapshot:
@@ -93,8 +95,7 @@ class EmotionProfileManager:
             return None
 
         try:
-            with open(profile_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = orjson.loads(profile_path.read_bytes())
 
             # 重建EmotionSnapshot对象
             snapshots = [EmotionSnapshot(**s) for s in data['snapshots']]
@@ -427,7 +428,9 @@ class EmotionProfileManager:
             'intervention_count': profile.intervention_count
         }
 
-        with open(profile_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        profile_path.write_bytes(orjson.dumps(data, option=PROFILE_JSON_OPTIONS))
+
+        # 同步写入数据库，供管理端列表/统计查询
+        save_profile_record(data)
 
         logger.debug(f"保存画像: {profile.user_id}")
@@ -0,0 +1,115 @@
+"""
+画像数据库存储
+画像 JSON 文件的数据库索引：保存画像时写入，供管理端列表、详情和统计直接查询
+"""
+
+from pathlib import Path
+from typing import Dict
+
+import orjson
+from loguru import logger
+from sqlalchemy import func, select, update
+
+from app.core.database import SessionLocal
+from app.models.user_models import ProfileRecord
+
+# 画像文件的 orjson 序列化选项（缩进便于查看；兼容 numpy 数值和非字符串键）
+PROFILE_JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _to_record_values(data: Dict) -> Dict:
+    """从画像 dict 提取数据库列"""
+    return {
+        'user_id': str(data['user_id']),
+        'created_at': data.get('created_at'),
+        # 列表按 (updated_at, user_id) 游标分页，NULL 无法参与比较，缺失时用 created_at 或空串代替
+        'updated_at': data.get('updated_at') or data.get('created_at') or '',
+        'total_interactions': data.get('total_interactions') or 0,
+        'crisis_count': data.get('crisis_count') or 0,
+        'intervention_count': data.get('intervention_count') or 0,
+        'data_quality_score': data.get('data_quality_score') or 0.0,
+        'data': orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode(),
+    }
+
+
+def save_profile_record(data: Dict, db=None):
+    """
+    写入（或更新）一条画像记录
+
+    画像文件仍是主存储，数据库写入失败只记录警告，不影响画像保存。
+
+    Args:
+        data: 画像 dict（与画像文件内容一致）
+        db: 可选的数据库会话；不传时自行创建并提交
+    """
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        db.merge(ProfileRecord(**_to_record_values(data)))
+        if own_session:
+            db.commit()
+    except Exception as e:
+        if own_session:
+            db.rollback()
+        logger.warning(f"画像写入数据库失败 {data.get('user_id')}: {e}")
+    finally:
+        if own_session:
+            db.close()
+
+
+def _backfill_updated_at(db):
+    """为旧记录补上 updated_at（此前写入的记录可能为 NULL，翻页时会被跳过）"""
+    result = db.execute(
+        update(ProfileRecord)
+        .where(ProfileRecord.updated_at.is_(None))
+        .values(updated_at=func.coalesce(ProfileRecord.created_at, ''))
+    )
+    if result.rowcount:
+        db.commit()
+        logger.info(f"已为 {result.rowcount} 个画像补上 updated_at")
+
+
+def import_profile_files(directory: str, only_if_empty: bool = False) -> int:
+    """
+    将画像目录中的 JSON 文件导入数据库（用于初始化或重建）
+
+    每次调用都会先为 updated_at 为空的旧记录补值，保证列表分页不漏记录。
+
+    Args:
+        directory: 画像目录
+        only_if_empty: 为 True 时仅在表为空时导入
+
+    Returns:
+        导入的画像数量
+    """
+    profile_dir = Path(directory)
+    if not profile_dir.exists():
+        return 0
+
+    db = SessionLocal()
+    try:
+        _backfill_updated_at(db)
+        if only_if_empty and db.scalar(select(func.count()).select_from(ProfileRecord)):
+            return 0
+
+        count = 0
+        for path in profile_dir.glob('*.json'):
+            # Skip hidden files and None.json (invalid user)
+            if path.name.startswith('.') or path.name == 'None.json':
+                continue
+            try:
+                data = orjson.loads(path.read_bytes())
+            except Exception as e:
+                logger.warning(f"Failed to read profile {path.name}: {e}")
+                continue
+            data.setdefault('user_id', path.stem)
+            save_profile_record(data, db=db)
+            count += 1
+
+        db.commit()
+        logger.info(f"已导入 {count} 个画像到数据库")
+        return count
+    finally:
+        db.close()
+
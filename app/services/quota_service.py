@@ -4,6 +4,7 @@
 
 from datetime import date, datetime
 from typing import Optional
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from loguru import logger
 
@@ -25,7 +26,8 @@ class QuotaService:
         Returns:
             用户额度对象
         """
-        quota = db.query(UserQuota).filter(UserQuota.user_id == user.id).first()
+        # 通过关联属性读取，调用方已预加载时不再额外查询
+        quota = user.quota
 
         if quota is None:
             # 首次创建额度记录
@@ -50,6 +52,55 @@ class QuotaService:
 
         return quota
 
+    @staticmethod
+    def bulk_reset_stale_quotas(db: Session) -> int:
+        """
+        批量重置所有过期的每日额度（单条 UPDATE）
+
+        Args:
+            db: 数据库会话
+
+        Returns:
+            被重置的记录数
+        """
+        today = date.today()
+        result = db.execute(
+            update(UserQuota)
+            .where(UserQuota.quota_date < today)
+            .values(daily_used=0, quota_date=today)
+        )
+        db.commit()
+
+        if result.rowcount:
+            logger.info(f"Reset {result.rowcount} stale daily quotas")
+
+        return result.rowcount
+
+    @staticmethod
+    def lock_quota(db: Session, quota: UserQuota) -> UserQuota:
+        """
+        锁定额度行并刷新为最新值（SELECT ... FOR NO KEY UPDATE NOWAIT）
+
+        检查与扣除之间持有行锁，避免并发请求重复扣除；锁在提交或回滚时释放。
+        行已被其他事务锁定时立即抛出 OperationalError，而不是排队等待。
+        SQLite 不支持行锁，直接返回原对象。
+
+        Args:
+            db: 数据库会话
+            quota: 已加载的额度对象
+
+        Returns:
+            刷新后的额度对象（与传入的是同一个对象）
+        """
+        if db.get_bind().dialect.name == "sqlite":
+            return quota
+
+        return db.query(UserQuota)\
+            .filter(UserQuota.id == quota.id)\
+            .with_for_update(nowait=True, key_share=True)\
+            .populate_existing()\
+            .one()
+
     @staticmethod
     def has_quota(db: Session, user: User, cost: int = 1) -> bool:
         """
@@ -81,7 +132,9 @@ class QuotaService:
         user: User,
         action_type: str,
         cost: int = 1,
-        details: Optional[str] = None
+        details: Optional[str] = None,
+        quota: Optional[UserQuota] = None,
+        record_usage: bool = True
     ) -> bool:
         """
         消耗用户额度
@@ -92,6 +145,8 @@ class QuotaService:
             action_type: 操作类型
             cost: 消耗的额度
             details: 详细信息
+            quota: 本次请求已加载的额度对象（不传则重新检查）
+            record_usage: 是否同步写入使用记录（调用方改为批量写入时传 False）
 
         Returns:
             是否成功消耗额度
@@ -99,28 +154,31 @@ class QuotaService:
         # 管理员和会员不需要记录额度消耗
         if user.role in [UserRole.ADMIN, UserRole.MEMBER]:
             # 仍然记录使用记录，但不扣除额度
-            usage_record = UsageRecord(
-                user_id=user.id,
-                action_type=action_type,
-                resource_cost=0,  # 不扣除
-                details=details
-            )
-            db.add(usage_record)
-            db.commit()
+            if record_usage:
+                usage_record = UsageRecord(
+                    user_id=user.id,
+                    action_type=action_type,
+                    resource_cost=0,  # 不扣除
+                    details=details
+                )
+                db.add(usage_record)
+                db.commit()
             return True
 
-        quota = QuotaService.check_and_reset_daily_quota(db, user)
+        if quota is None:
+            quota = QuotaService.check_and_reset_daily_quota(db, user)
 
         # -1 表示无限额度
         if quota.daily_quota == -1:
-            usage_record = UsageRecord(
-                user_id=user.id,
-                action_type=action_type,
-                resource_cost=0,
-                details=details
-            )
-            db.add(usage_record)
-            db.commit()
+            if record_usage:
+                usage_record = UsageRecord(
+                    user_id=user.id,
+                    action_type=action_type,
+                    resource_cost=0,
+                    details=details
+                )
+                db.add(usage_record)
+                db.commit()
             return True
 
         # 检查额度是否足够
@@ -132,13 +190,14 @@ class QuotaService:
         quota.daily_used += cost
 
         # 记录使用
-        usage_record = UsageRecord(
-            user_id=user.id,
-            action_type=action_type,
-            resource_cost=cost,
-            details=details
-        )
-        db.add(usage_record)
+        if record_usage:
+            usage_record = UsageRecord(
+                user_id=user.id,
+                action_type=action_type,
+                resource_cost=cost,
+                details=details
+            )
+            db.add(usage_record)
 
         db.commit()
         logger.info(f"User {user.id} consumed {cost} quota for {action_type}, remaining: {quota.remaining_quota}")
@@ -146,18 +205,20 @@ class QuotaService:
         return True
 
     @staticmethod
-    def get_user_quota_info(db: Session, user: User) -> dict:
+    def get_user_quota_info(db: Session, user: User, quota: Optional[UserQuota] = None) -> dict:
         """
         获取用户额度信息
 
         Args:
             db: 数据库会话
             user: 用户对象
+            quota: 本次请求已加载的额度对象（不传则重新检查）
 
         Returns:
             额度信息字典
         """
-        quota = QuotaService.check_and_reset_daily_quota(db, user)
+        if quota is None:
+            quota = QuotaService.check_and_reset_daily_quota(db, user)
 
         return {
             "daily_quota": quota.daily_quota,
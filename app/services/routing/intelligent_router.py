@@ -6,7 +6,6 @@
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
-import numpy as np
 from loguru import logger
 
 
@@ -31,6 +30,9 @@ class RouteResult:
 class IntelligentRouter:
     """智能意图路由器"""
 
+    # 计算情绪斜率时统计的负面情绪
+    SLOPE_NEGATIVE_EMOTIONS = ('悲伤', '焦虑', '恐惧', '绝望', '愤怒')
+
     def __init__(self, config: Dict):
         self.config = config
         self.routing_config = config.get('routing', {})
@@ -68,7 +70,7 @@ class IntelligentRouter:
         # 优先级2: 检查是否需要DBT干预（L2）
         intervention_result = self._check_intervention_needed(emotion_features, audio_features, video_features)
         if intervention_result.level == RouteLevel.L2_INTERVENTION:
-            logger.info(f"触发L2干预路由: {intervention_result.reason}")
+            logger.info("触发L2干预路由: {}", intervention_result.reason)
             return intervention_result
 
         # 优先级3: 默认快速通路（L1）
@@ -216,7 +218,7 @@ class IntelligentRouter:
                 intervention_score += 0.1
 
         # 判定是否需要干预
-        logger.info(f"L2判定: score={intervention_score:.2f}, threshold={self.l2_threshold}, indicators={len(intervention_indicators)}, content={intervention_indicators}")
+        logger.info("L2判定: score={:.2f}, threshold={}, indicators={}, content={}", intervention_score, self.l2_threshold, len(intervention_indicators), intervention_indicators)
         if intervention_score >= self.l2_threshold or len(intervention_indicators) >= 2:
             return RouteResult(
                 level=RouteLevel.L2_INTERVENTION,
@@ -228,7 +230,7 @@ class IntelligentRouter:
             )
 
         # 未达到干预阈值
-        logger.info(f"未达到L2阈值: score={intervention_score:.2f} < {self.l2_threshold}, indicators={len(intervention_indicators)} < 2")
+        logger.info("未达到L2阈值: score={:.2f} < {}, indicators={} < 2", intervention_score, self.l2_threshold, len(intervention_indicators))
         return RouteResult(
             level=RouteLevel.L1_QUICK,
             confidence=0.0,
@@ -250,21 +252,20 @@ class IntelligentRouter:
         recent = emotion_history[-5:]
 
         # 计算负面情绪平均值的变化趋势
-        negative_emotions = ['悲伤', '焦虑', '恐惧', '绝望', '愤怒']
-        scores = []
-        for record in recent:
-            negative_score = sum(record.get(e, 0.0) for e in negative_emotions)
-            scores.append(negative_score)
+        scores = [
+            sum(record.get(e, 0.0) for e in self.SLOPE_NEGATIVE_EMOTIONS)
+            for record in recent
+        ]
 
         # 计算斜率（线性回归）
-        if len(scores) < 2:
-            return 0.0
-
-        x = np.arange(len(scores))
-        y = np.array(scores)
-        slope = np.polyfit(x, y, 1)[0]
-
-        return float(slope)
+        # 最多5个点，直接用最小二乘闭式解，避免 np.polyfit 的 SVD 开销
+        n = len(scores)
+        x_mean = (n - 1) / 2
+        y_mean = sum(scores) / n
+        numerator = sum((i - x_mean) * (y - y_mean) for i, y in enumerate(scores))
+        denominator = n * (n * n - 1) / 12  # sum((i - x_mean)^2), i = 0..n-1
+
+        return float(numerator / denominator)
 
     def analyze_conversation_context(self, conversation_history: List[Dict]) -> Dict:
         """
@@ -0,0 +1,125 @@
+"""
+语义缓存服务
+对相似的用户消息复用最近的 Agent 回复，跳过完整的 LLM + 工具调用流程
+
+缓存命中会跳过情绪与危机检测，因此涉及危机的消息既不查缓存也不写缓存；
+调用方还应只缓存经风险评估为低风险（L1）的回复。
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+# 与路由的 L3 危机关键词保持一致，另加更宽泛的词：
+# "我想死" 与 "我不想死" 语义相反，但向量相似度可能超过阈值
+DEFAULT_BYPASS_TERMS = frozenset(
+    kw.strip()
+    for kw in os.getenv('ROUTING_L3_CRISIS_KEYWORDS', '自杀,自残,自毁,不想活,结束生命,死掉,杀死自己').split(',')
+    if kw.strip()
+) | {"死", "自伤", "伤害自己", "轻生", "活着", "割腕", "跳楼"}
+
+
+class SemanticCache:
+    """
+    按用户隔离的语义缓存
+
+    消息经 embedding 后做 L2 归一化，与该用户最近的缓存向量计算内积（即余弦相似度），
+    相似度达到阈值时直接返回缓存的回复。
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        ttl_seconds: int = 24 * 3600,
+        max_entries_per_user: int = 256,
+        embedding_function=None,
+        bypass_terms: Iterable[str] = DEFAULT_BYPASS_TERMS
+    ):
+        self.threshold = threshold
+        self.bypass_terms = tuple(bypass_terms)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_user = max_entries_per_user
+        self._embedding_function = embedding_function
+        self._lock = threading.Lock()
+        # user_id -> (向量矩阵, [(回复, 创建时间)])
+        self._entries: Dict[str, Tuple[np.ndarray, List[Tuple[str, float]]]] = {}
+
+    def _get_embedding_function(self):
+        """延迟创建 embedding 函数（默认使用 Chroma 内置的 all-MiniLM-L6-v2）"""
+        if self._embedding_function is None:
+            from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+            self._embedding_function = DefaultEmbeddingFunction()
+        return self._embedding_function
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """
+        计算归一化的文本向量
+
+        Returns:
+            一维向量；文本含危机相关词或 embedding 失败时返回 None（本次不查也不写缓存）
+        """
+        if not text or any(term in text for term in self.bypass_terms):
+            return None
+        try:
+            vector = np.asarray(self._get_embedding_function()([text])[0], dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"语义缓存 embedding 失败: {e}")
+            return None
+
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def lookup(self, user_id: str, vector: Optional[np.ndarray]) -> Optional[str]:
+        """查找相似度最高且未过期的缓存回复"""
+        if vector is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            matrix, items = entry
+
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            response, created_at = items[best]
+
+            if scores[best] < self.threshold or time.time() - created_at > self.ttl_seconds:
+                return None
+
+        logger.info(f"语义缓存命中: user={user_id}, score={scores[best]:.3f}")
+        return response
+
+    def add(self, user_id: str, vector: Optional[np.ndarray], response: str):
+        """写入缓存，同时淘汰该用户过期及超量的条目"""
+        if vector is None:
+            return
+
+        now = time.time()
+        with self._lock:
+            matrix, items = self._entries.get(
+                user_id, (np.empty((0, vector.shape[0]), dtype=np.float32), [])
+            )
+
+            keep = [i for i, (_, created_at) in enumerate(items)
+                    if now - created_at <= self.ttl_seconds]
+            keep = keep[-(self.max_entries_per_user - 1):] if self.max_entries_per_user > 1 else []
+
+            matrix = np.vstack([matrix[keep], vector[np.newaxis, :]])
+            items = [items[i] for i in keep] + [(response, now)]
+            self._entries[user_id] = (matrix, items)
+
+    def clear(self, user_id: Optional[str] = None):
+        """清空指定用户或全部缓存"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
@@ -6,12 +6,14 @@
 // ==================== Configuration ====================
 const API_BASE = window.location.origin;
 const DBT_ADMIN_KEY = 'dbt-admin-secret-key'; // Default key, should match backend
+const PROFILE_PAGE_SIZE = 50;
 
 // ==================== State ====================
 const AdminState = {
     skills: [],
     rules: [],
     profiles: [],
+    profilesCursor: null,
     users: [],
     modules: [],
     stats: null,
@@ -134,6 +136,16 @@ async function fetchProfileAPI(endpoint) {
     return response.json();
 }
 
+// 画像列表按游标分页，下一页游标在响应头 X-Next-Cursor 中
+async function fetchProfilePage(search, cursor) {
+    const params = new URLSearchParams({ limit: PROFILE_PAGE_SIZE });
+    if (search) params.set('search', search);
+    if (cursor) params.set('cursor', cursor);
+    const response = await Auth.fetch(`${API_BASE}/api/v1/admin/profiles?${params}`);
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    return { items: await response.json(), nextCursor: response.headers.get('X-Next-Cursor') };
+}
+
 // ==================== Dashboard ====================
 async function loadDashboardData() {
     try {
@@ -146,9 +158,8 @@ async function loadDashboardData() {
 
         // Load profiles count
         try {
-            const profiles = await fetchProfileAPI('/profiles');
-            document.getElementById('stat-users').textContent = profiles.length || 0;
-            AdminState.profiles = profiles;
+            const profileStats = await fetchProfileAPI('/dashboard');
+            document.getElementById('stat-users').textContent = profileStats.total_profiles || 0;
         } catch (e) {
             document.getElementById('stat-users').textContent = '--';
         }
@@ -675,16 +686,35 @@ async function deleteRule(id) {
 }
 
 // ==================== Profiles Management ====================
-async function loadProfiles() {
+let profilesRequestSeq = 0;
+let profilesSearchTimer = null;
+
+async function loadProfiles(append = false) {
+    const search = document.getElementById('profiles-search').value.trim();
+    const seq = ++profilesRequestSeq;
     try {
-        const profiles = await fetchProfileAPI('/profiles');
-        AdminState.profiles = profiles;
-        renderProfilesList(profiles);
+        const { items, nextCursor } = await fetchProfilePage(search, append ? AdminState.profilesCursor : null);
+        // 搜索条件已变化时丢弃过期的响应
+        if (seq !== profilesRequestSeq) return;
+        AdminState.profiles = append ? AdminState.profiles.concat(items) : items;
+        AdminState.profilesCursor = nextCursor;
+        renderProfilesList(AdminState.profiles);
     } catch (error) {
+        if (seq !== profilesRequestSeq) return;
         console.error('Failed to load profiles:', error);
+        if (append) {
+            showToast('加载失败: ' + error.message, 'error');
+            return;
+        }
+        AdminState.profilesCursor = null;
         document.getElementById('profiles-list').innerHTML =
             '<div class="col-span-full text-center py-8 text-red-500">加载失败: ' + error.message + '</div>';
     }
+    document.getElementById('profiles-load-more').classList.toggle('hidden', !AdminState.profilesCursor);
+}
+
+function loadMoreProfiles() {
+    if (AdminState.profilesCursor) loadProfiles(true);
 }
 
 function renderProfilesList(profiles) {
@@ -720,9 +750,9 @@ function renderProfilesList(profiles) {
 }
 
 function filterProfiles() {
-    const search = document.getElementById('profiles-search').value.toLowerCase();
-    const filtered = AdminState.profiles.filter(p => !search || p.user_id.toLowerCase().includes(search));
-    renderProfilesList(filtered);
+    // 在服务端按用户ID搜索，输入停顿后再请求
+    clearTimeout(profilesSearchTimer);
+    profilesSearchTimer = setTimeout(() => loadProfiles(), 300);
 }
 
 async function viewProfile(userId) {